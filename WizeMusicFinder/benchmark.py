@@ -0,0 +1,354 @@
+"""Offline benchmark of the weekly playlist job.
+
+Spotify, spotdl and the database are replaced by stand-ins that replay a recorded (or synthetic)
+catalog with configurable latency, so the job can be measured without credentials:
+
+    python benchmark.py --sizes 50,200,1000 --genres pop,rock --api-latency 0.05
+
+A catalog can be recorded from the live API with RecordingSpotify and replayed with --catalog.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime, timedelta
+
+import main
+from downloader import DownloadEngine
+from metadata_cache import open_metadata_cache
+from run_manifest import RunManifest
+from run_metrics import run_metrics
+from spotify_scheduler import SpotifyScheduler
+from storage import TrackStorage
+
+FAKE_SPOTDL = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fake_spotdl.py')
+
+# Page size the real API uses for tracks embedded in album objects
+ALBUM_TRACKS_PAGE_SIZE = 50
+
+
+def synthetic_catalog(album_count, tracks_per_album=10, artist_count=None, genres=('pop', 'rock', 'jazz'),
+                      max_age_days=120, seed=0):
+    # Builds a catalog shaped like recorded responses; albums are ordered newest first, like the feed
+    rng = random.Random(seed)
+    artist_count = artist_count or max(1, album_count // 3)
+    today = datetime.now().date()
+    artists = {}
+    for i in range(artist_count):
+        artist_id = f"artist{i:06d}"
+        artists[artist_id] = {'id': artist_id, 'name': f"Artist {i}",
+                              'genres': rng.sample(list(genres), rng.randint(1, min(2, len(genres))))}
+    albums = []
+    album_tracks = {}
+    tracks = {}
+    for i in range(album_count):
+        album_id = f"album{i:06d}"
+        artist_id = f"artist{rng.randrange(artist_count):06d}"
+        release_date = today - timedelta(days=int(max_age_days * i / max(album_count, 1)))
+        albums.append({'id': album_id, 'name': f"Album {i}", 'release_date': release_date.isoformat(),
+                       'release_date_precision': 'day', 'album_type': 'album',
+                       'artists': [{'id': artist_id, 'name': artists[artist_id]['name']}]})
+        album_tracks[album_id] = []
+        for n in range(tracks_per_album):
+            track_id = f"{album_id}t{n:02d}"
+            album_tracks[album_id].append({'id': track_id, 'name': f"Track {n}"})
+            tracks[track_id] = {'id': track_id, 'name': f"Track {n} of album {i}",
+                                'artists': [{'id': artist_id, 'name': artists[artist_id]['name']}],
+                                'duration_ms': rng.randint(120000, 300000), 'popularity': rng.randint(0, 100)}
+    return {'albums': albums, 'artists': artists, 'album_tracks': album_tracks, 'tracks': tracks}
+
+
+def load_catalog(path):
+    with open(path, 'r') as catalog_file:
+        return json.load(catalog_file)
+
+
+def save_catalog(catalog, path):
+    with open(path, 'w') as catalog_file:
+        json.dump(catalog, catalog_file)
+
+
+class FakeSpotify:
+    """Serves the spotipy endpoints the job uses from a catalog, sleeping `latency` seconds per call."""
+
+    def __init__(self, catalog, latency=0.0):
+        self.catalog = catalog
+        self.latency = latency
+        self.albums_by_id = {album['id']: album for album in catalog['albums']}
+        self.calls = Counter()
+        self.lock = threading.Lock()
+
+    def _call(self, endpoint):
+        with self.lock:
+            self.calls[endpoint] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _album_tracks_page(self, album_id, limit, offset):
+        items = self.catalog['album_tracks'].get(album_id, [])
+        has_next = offset + limit < len(items)
+        return {'items': items[offset:offset + limit], 'total': len(items), 'limit': limit, 'offset': offset,
+                'next': f"album_tracks:{album_id}:{offset + limit}:{limit}" if has_next else None}
+
+    def new_releases(self, country=None, limit=20, offset=0):
+        self._call('new_releases')
+        albums = self.catalog['albums']
+        has_next = offset + limit < len(albums)
+        return {'albums': {'items': albums[offset:offset + limit], 'total': len(albums), 'limit': limit,
+                           'offset': offset, 'next': f"new_releases:{offset + limit}" if has_next else None}}
+
+    def artist(self, artist_id):
+        self._call('artist')
+        return self.catalog['artists'][artist_id]
+
+    def artists(self, artist_ids):
+        self._call('artists')
+        return {'artists': [self.catalog['artists'].get(artist_id) for artist_id in artist_ids]}
+
+    def album_tracks(self, album_id, limit=50, offset=0, market=None):
+        self._call('album_tracks')
+        return self._album_tracks_page(album_id, limit, offset)
+
+    def albums(self, album_ids, market=None):
+        self._call('albums')
+        return {'albums': [{**self.albums_by_id[album_id],
+                            'tracks': self._album_tracks_page(album_id, ALBUM_TRACKS_PAGE_SIZE, 0)}
+                           if album_id in self.albums_by_id else None for album_id in album_ids]}
+
+    def next(self, result):
+        self._call('next')
+        _, album_id, offset, limit = result['next'].split(':')
+        return self._album_tracks_page(album_id, int(limit), int(offset))
+
+    def track(self, track_id, market=None):
+        self._call('track')
+        return self.catalog['tracks'][track_id]
+
+    def tracks(self, track_ids, market=None):
+        self._call('tracks')
+        return {'tracks': [self.catalog['tracks'].get(track_id) for track_id in track_ids]}
+
+
+class RecordingSpotify:
+    """Wraps a live spotipy client and keeps the entities it returns, to replay later with FakeSpotify."""
+
+    def __init__(self, sp):
+        self.sp = sp
+        self.catalog = {'albums': [], 'artists': {}, 'album_tracks': {}, 'tracks': {}}
+        self.lock = threading.Lock()
+
+    def new_releases(self, *args, **kwargs):
+        response = self.sp.new_releases(*args, **kwargs)
+        with self.lock:
+            known = {album['id'] for album in self.catalog['albums']}
+            self.catalog['albums'] += [album for album in response['albums']['items'] if album['id'] not in known]
+        return response
+
+    def artist(self, artist_id):
+        response = self.sp.artist(artist_id)
+        with self.lock:
+            self.catalog['artists'][response['id']] = response
+        return response
+
+    def artists(self, artist_ids):
+        response = self.sp.artists(artist_ids)
+        with self.lock:
+            self.catalog['artists'].update((artist['id'], artist) for artist in response['artists'] if artist)
+        return response
+
+    def album_tracks(self, album_id, *args, **kwargs):
+        response = self.sp.album_tracks(album_id, *args, **kwargs)
+        with self.lock:
+            self.catalog['album_tracks'].setdefault(album_id, []).extend(response['items'])
+        return response
+
+    def albums(self, album_ids, *args, **kwargs):
+        # Keeps the embedded first page of tracks; next() appends the rest
+        response = self.sp.albums(album_ids, *args, **kwargs)
+        with self.lock:
+            for album in response['albums']:
+                if album:
+                    self.catalog['album_tracks'][album['id']] = list(album['tracks']['items'])
+        return response
+
+    def next(self, result):
+        # Later pages of an album's tracks carry the album ID in their href
+        response = self.sp.next(result)
+        href = response.get('href') or ''
+        if '/albums/' in href:
+            album_id = href.split('/albums/')[1].split('/')[0]
+            with self.lock:
+                self.catalog['album_tracks'].setdefault(album_id, []).extend(response['items'])
+        return response
+
+    def track(self, track_id, *args, **kwargs):
+        response = self.sp.track(track_id, *args, **kwargs)
+        with self.lock:
+            self.catalog['tracks'][response['id']] = response
+        return response
+
+    def tracks(self, track_ids, *args, **kwargs):
+        response = self.sp.tracks(track_ids, *args, **kwargs)
+        with self.lock:
+            self.catalog['tracks'].update((track['id'], track) for track in response['tracks'] if track)
+        return response
+
+    def save(self, path):
+        with self.lock:
+            save_catalog(self.catalog, path)
+
+
+class FakeStorage(TrackStorage):
+    """Database stand-in: sleeps `transaction_latency` per write_tracks call plus `row_latency` per row."""
+
+    def __init__(self, transaction_latency=0.0, row_latency=0.0):
+        self.transaction_latency = transaction_latency
+        self.row_latency = row_latency
+        self.transactions = 0
+        self.rows = {}
+        self.lock = threading.Lock()
+
+    def write_tracks(self, tracks, week_number, genre):
+        if not tracks:
+            return 0
+        time.sleep(self.transaction_latency + self.row_latency * len(tracks))
+        with self.lock:
+            self.transactions += 1
+            for track in tracks:
+                self.rows[(track['track_id'], week_number, genre)] = track
+        return len(tracks)
+
+
+# Stages reported by both modes, under the names of their run_metrics timings
+STAGES = ('get_top_tracks', 'download_top_tracks', 'insert')
+
+
+def run_stages(sp, genres, storage, engine, cache, manifest):
+    # The job's three stages one after another, so each one's time can be read on its own.
+    # Returns the seconds spotdl invocations spent downloading, summed over the engine's workers
+    week_number = datetime.now().isocalendar()[1]
+    top_tracks_by_genre = main.get_top_tracks_by_genre(sp, genres, cache)
+    download_seconds = 0.0
+    for genre, top_tracks in top_tracks_by_genre.items():
+        results = main.download_top_tracks(top_tracks, genre, week_number, engine, manifest)
+        download_seconds += sum(result['seconds'] for result in results)
+    for genre, top_tracks in top_tracks_by_genre.items():
+        main.store_top_tracks(storage, top_tracks, genre, week_number, manifest)
+    return download_seconds
+
+
+def run_benchmark(catalog, genres, mode='pipeline', api_latency=0.0, download_latency=0.0, db_latency=0.0,
+                  rate=1000.0, spotify_workers=8, download_workers=4):
+    fake_sp = FakeSpotify(catalog, latency=api_latency)
+    storage = FakeStorage(transaction_latency=db_latency, row_latency=db_latency / 100)
+    engine = DownloadEngine(spotdl_command=[sys.executable, FAKE_SPOTDL], max_workers=1,
+                            env={'FAKE_SPOTDL_DELAY': str(download_latency)})
+    previous_cwd = os.getcwd()
+    run_metrics.reset()
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        tracemalloc.start()
+        start = time.perf_counter()
+        download_seconds = None
+        try:
+            with SpotifyScheduler(fake_sp, max_workers=spotify_workers, rate=rate, burst=max(1, int(rate))) as sp:
+                if mode == 'pipeline':
+                    main.download_weekly_genre_playlist(genres, cache_location='cache.db',
+                                                        download_workers=download_workers, manifest_path='manifest.db',
+                                                        storage=storage, sp=sp, engine=engine)
+                else:
+                    cache = open_metadata_cache('cache.db')
+                    manifest = RunManifest('manifest.db')
+                    engine.max_workers = download_workers
+                    try:
+                        download_seconds = run_stages(sp, genres, storage, engine, cache, manifest)
+                    finally:
+                        cache.close()
+                        manifest.close()
+            wall = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+            os.chdir(previous_cwd)
+    snapshot = run_metrics.snapshot()
+    if mode == 'pipeline':
+        # Stages overlap and run several workers, so wall and busy time differ
+        stages = {stage: {'wall_seconds': snapshot['pipeline'][stage]['wall_seconds'],
+                          'busy_seconds': snapshot['pipeline'][stage]['busy_seconds']} for stage in STAGES}
+    else:
+        # Stages run one after another; only downloads run several workers at once
+        stages = {stage: {'wall_seconds': snapshot['timings'][stage]['total'],
+                          'busy_seconds': snapshot['timings'][stage]['total']} for stage in STAGES}
+        stages['download_top_tracks']['busy_seconds'] = download_seconds
+    return {
+        'mode': mode,
+        'albums': len(catalog['albums']),
+        'tracks': len(catalog['tracks']),
+        'wall_seconds': wall,
+        'api_calls': sum(fake_sp.calls.values()),
+        'api_calls_by_endpoint': dict(fake_sp.calls),
+        'peak_memory_mb': peak / 1024 / 1024,
+        'db_transactions': storage.transactions,
+        'db_rows': len(storage.rows),
+        'stages': stages,
+        'timings': {stage: timing['total'] for stage, timing in snapshot['timings'].items()},
+        'counters': snapshot['counters'],
+    }
+
+
+def format_result(result):
+    stages = ', '.join(f"{stage}={seconds['wall_seconds']:.2f}s wall/{seconds['busy_seconds']:.2f}s busy"
+                       for stage, seconds in result['stages'].items())
+    return (f"{result['mode']:8} albums={result['albums']:<6} tracks={result['tracks']:<6} "
+            f"wall={result['wall_seconds']:.2f}s api_calls={result['api_calls']:<5} "
+            f"peak_mem={result['peak_memory_mb']:.1f}MB db_tx={result['db_transactions']} | {stages}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='50,200', help="Comma-separated synthetic catalog sizes, in albums")
+    parser.add_argument('--catalog', help="Recorded catalog JSON to replay instead of synthetic catalogs")
+    parser.add_argument('--genres', default='pop,rock')
+    parser.add_argument('--modes', default='stages,pipeline', help="Comma-separated: stages, pipeline")
+    parser.add_argument('--tracks-per-album', type=int, default=10)
+    parser.add_argument('--api-latency', type=float, default=0.02, help="Seconds per Spotify call")
+    parser.add_argument('--download-latency', type=float, default=0.01, help="Seconds per downloaded track")
+    parser.add_argument('--db-latency', type=float, default=0.005, help="Seconds per database transaction")
+    parser.add_argument('--rate', type=float, default=1000.0, help="Spotify requests per second allowed")
+    parser.add_argument('--download-workers', type=int, default=4)
+    parser.add_argument('--json', help="Also write the results to this JSON file")
+    return parser.parse_args(argv)
+
+
+def run(argv=None):
+    args = parse_args(argv)
+    genres = args.genres.split(',')
+    if args.catalog:
+        catalogs = [load_catalog(args.catalog)]
+    else:
+        catalogs = [synthetic_catalog(int(size), tracks_per_album=args.tracks_per_album)
+                    for size in args.sizes.split(',')]
+
+    # Stage timings come from the metrics hook, so the job's own logging stays quiet
+    main.logging.getLogger().setLevel(main.logging.WARNING)
+    results = []
+    for catalog in catalogs:
+        for mode in args.modes.split(','):
+            result = run_benchmark(catalog, genres, mode, args.api_latency, args.download_latency, args.db_latency,
+                                   args.rate, download_workers=args.download_workers)
+            print(format_result(result))
+            results.append(result)
+    if args.json:
+        with open(args.json, 'w') as results_file:
+            json.dump(results, results_file, indent=2)
+    return results
+
+
+if __name__ == '__main__':
+    run()
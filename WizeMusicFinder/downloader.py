@@ -0,0 +1,127 @@
+import glob
+import logging
+import os
+import re
+import shlex
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Command used to run spotdl; set SPOTDL_BIN (e.g. "python fake_spotdl.py") to swap in a stand-in
+DEFAULT_SPOTDL_COMMAND = shlex.split(os.environ.get('SPOTDL_BIN', 'spotdl'))
+
+# spotdl output template; the track ID in the file name lets us match files back to tracks
+OUTPUT_TEMPLATE = '{artists} - {title} [{track-id}].{output-ext}'
+# Pinned so is_complete_download can rely on MP3 headers whatever spotdl's configured default is
+OUTPUT_FORMAT = 'mp3'
+TRACK_FILE_PATTERN = re.compile(r'\[([0-9A-Za-z]+)\]\.[^.]+$')
+
+
+def find_track_file(folder_path, track_id):
+    matches = glob.glob(os.path.join(glob.escape(folder_path), f"*[[]{track_id}[]].*"))
+    return matches[0] if matches else None
+
+
+def index_track_files(folder_path):
+    # Maps track ID -> file path for every downloaded track in the folder, in a single directory scan
+    try:
+        names = os.listdir(folder_path)
+    except FileNotFoundError:
+        return {}
+    index = {}
+    for name in names:
+        match = TRACK_FILE_PATTERN.search(name)
+        if match:
+            index[match.group(1)] = os.path.join(folder_path, name)
+    return index
+
+
+def is_complete_download(path, duration_ms=None, min_bytes_per_second=4000):
+    # Cheap truncation check: an MP3 header, and at least 32 kbps worth of bytes for the track duration
+    try:
+        size = os.path.getsize(path)
+        with open(path, 'rb') as audio_file:
+            header = audio_file.read(3)
+    except OSError:
+        return False
+    if not (header == b'ID3' or (len(header) >= 2 and header[0] == 0xFF and header[1] & 0xE0 == 0xE0)):
+        return False
+    if duration_ms:
+        return size >= duration_ms / 1000 * min_bytes_per_second
+    return size > 0
+
+
+class DownloadEngine:
+    """Downloads tracks with spotdl, several tracks per invocation and several invocations at once.
+
+    A batch that fails is not retried as a whole: each of its tracks whose file is missing is
+    retried on its own, up to `max_retries` times. An invocation is killed after
+    `timeout_per_track` seconds per track it was given, so a hung spotdl cannot block a worker.
+    `env` adds environment variables for the spotdl processes only.
+    """
+
+    def __init__(self, spotdl_command=None, max_workers=4, batch_size=10, max_retries=2, timeout_per_track=120.0,
+                 env=None):
+        self.spotdl_command = list(spotdl_command or DEFAULT_SPOTDL_COMMAND)
+        self.env = dict(env or {})
+        self.max_workers = max_workers
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.timeout_per_track = timeout_per_track
+
+    def run_spotdl(self, track_ids, folder_path):
+        command = [*self.spotdl_command, 'download', *['spotify:track:' + track_id for track_id in track_ids],
+                   '--output', os.path.join(folder_path, OUTPUT_TEMPLATE), '--format', OUTPUT_FORMAT]
+        try:
+            subprocess.run(command, check=True, capture_output=True, timeout=self.timeout_per_track * len(track_ids),
+                           env={**os.environ, **self.env} if self.env else None)
+            return True
+        except (subprocess.SubprocessError, OSError) as e:
+            # spotdl explains failures on stderr; the exception alone only carries the exit status
+            stderr = getattr(e, 'stderr', None)
+            if isinstance(stderr, bytes):
+                stderr = stderr.decode(errors='replace')
+            details = f"\n{stderr.strip()}" if stderr and stderr.strip() else ""
+            logging.error(f"Error downloading {len(track_ids)} tracks: {str(e)}{details}")
+            return False
+
+    def download_batch(self, track_ids, folder_path):
+        # Returns one result dict per track: track_id, success, path, attempts and seconds spent
+        start = time.perf_counter()
+        self.run_spotdl(track_ids, folder_path)
+        share = (time.perf_counter() - start) / len(track_ids)
+        present = index_track_files(folder_path)
+        results = []
+        for track_id in track_ids:
+            result = {'track_id': track_id, 'success': True, 'path': present.get(track_id), 'attempts': 1,
+                      'seconds': share}
+            while result['path'] is None:
+                if result['attempts'] > self.max_retries:
+                    result['success'] = False
+                    break
+                logging.warning(f"Retrying track {track_id} (attempt {result['attempts'] + 1})")
+                retry_start = time.perf_counter()
+                self.run_spotdl([track_id], folder_path)
+                result['seconds'] += time.perf_counter() - retry_start
+                result['attempts'] += 1
+                result['path'] = find_track_file(folder_path, track_id)
+            results.append(result)
+        return results
+
+    def download(self, track_ids, folder_path):
+        # Returns the per-track results in the order of track_ids, without duplicates
+        os.makedirs(folder_path, exist_ok=True)
+        start = time.perf_counter()
+        track_ids = list(dict.fromkeys(track_ids))
+        batches = [track_ids[i:i + self.batch_size] for i in range(0, len(track_ids), self.batch_size)]
+        results = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='spotdl') as executor:
+            futures = [executor.submit(self.download_batch, batch, folder_path) for batch in batches]
+            for future in as_completed(futures):
+                for result in future.result():
+                    results[result['track_id']] = result
+        elapsed = time.perf_counter() - start
+        succeeded = sum(result['success'] for result in results.values())
+        logging.debug(f"Downloaded {succeeded}/{len(track_ids)} tracks to {folder_path} in {elapsed:.1f}s "
+                     f"({succeeded / elapsed if elapsed else 0:.2f} tracks/s)")
+        return [results[track_id] for track_id in track_ids]
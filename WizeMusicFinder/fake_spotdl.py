@@ -0,0 +1,51 @@
+"""Offline stand-in for the spotdl CLI.
+
+Accepts `download <spotify:track:ID>... --output TEMPLATE [--format EXT]` and writes a small placeholder
+MP3 per track. FAKE_SPOTDL_DELAY sets the seconds spent per track, FAKE_SPOTDL_FAIL lists
+comma-separated track IDs that never download, and FAKE_SPOTDL_SIZE sets the file size in bytes
+(files are sparse, so large sizes cost no disk).
+"""
+import os
+import sys
+import time
+
+
+def main(argv):
+    args = argv[1:] if argv and argv[0] == 'download' else argv
+    template = '{artists} - {title} [{track-id}].{output-ext}'
+    if '--output' in args:
+        index = args.index('--output')
+        template = args[index + 1]
+        args = args[:index] + args[index + 2:]
+    output_format = 'mp3'
+    if '--format' in args:
+        index = args.index('--format')
+        output_format = args[index + 1]
+        args = args[:index] + args[index + 2:]
+
+    delay = float(os.environ.get('FAKE_SPOTDL_DELAY', '0'))
+    failing = set(filter(None, os.environ.get('FAKE_SPOTDL_FAIL', '').split(',')))
+    size = int(os.environ.get('FAKE_SPOTDL_SIZE', '2000000'))
+
+    failed = False
+    for query in args:
+        track_id = query.rsplit(':', 1)[-1].rsplit('/', 1)[-1]
+        time.sleep(delay)
+        if track_id in failing:
+            print(f"Failed to download {query}", file=sys.stderr)
+            failed = True
+            continue
+        path = template
+        for key, value in {'artists': 'Fake Artist', 'title': f"Track {track_id}", 'track-id': track_id,
+                           'output-ext': output_format}.items():
+            path = path.replace('{' + key + '}', value)
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'wb') as audio_file:
+            audio_file.write(b'ID3')
+            audio_file.truncate(size)
+        print(f"Downloaded \"{path}\"")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
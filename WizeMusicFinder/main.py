@@ -1,20 +1,32 @@
-import spotipy
 from spotipy.oauth2 import SpotifyClientCredentials
 import json
 from datetime import datetime, timedelta
-import pprint
 import os
-import psycopg2
-from psycopg2 import sql
 import logging
-import subprocess
+from contextlib import ExitStack
+from itertools import islice
+
+from downloader import DownloadEngine, index_track_files, is_complete_download
+from metadata_cache import cached_fetch, open_metadata_cache
+from pipeline import Pipeline
+from run_manifest import RunManifest
+from run_metrics import JsonLinesHook, run_metrics
+from spotify_scheduler import SpotifyScheduler, build_spotify_client, scheduled
+from storage import PostgresStorage
 
 # Adjust the parameters
 params = {
-    'limit': 50,  # Adjust the number of albums to retrieve
-    'offset': 5,
+    'limit': 50,  # Number of albums per new-releases page (Spotify maximum is 50)
+    'offset': 0,  # Offset of the first new-releases page
+    'countries': ['US'],  # Markets whose new releases are merged into one run
+    'max_age_days': 90,  # Albums released before this many days ago are ignored
 }
 
+# Maximum number of IDs accepted by Spotify's multi-ID endpoints
+ARTISTS_BATCH_SIZE = 50
+TRACKS_BATCH_SIZE = 50
+ALBUMS_BATCH_SIZE = 20
+
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -42,151 +54,410 @@ def authenticate_spotify():
 
     # Authenticate with Spotify API
     credentials = SpotifyClientCredentials(client_id=client_id, client_secret=client_secret)
-    sp = spotipy.Spotify(client_credentials_manager=credentials)
+    # Retries and Retry-After are handled by SpotifyScheduler, not by spotipy's own session
+    sp = build_spotify_client(client_credentials_manager=credentials)
 
     logging.info("Successfully authenticated with Spotify.")
 
     return sp
 
 
-def fetch_artist_details(sp, artist_id):
-    logging.info(f"Fetching artist details for artist ID: {artist_id}")
-    return sp.artist(artist_id)
-
-
-def fetch_track_details(sp, track_id):
-    logging.info(f"Fetching track details for track ID: {track_id}")
-    return sp.track(track_id)
-
-
-def get_top_tracks(sp, genre):
-    logging.info(f"Starting to get top tracks for genre: {genre}")
+def chunked(items, size):
+    iterator = iter(items)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def parse_release_date(album):
+    # Spotify gives 'YYYY', 'YYYY-MM' or 'YYYY-MM-DD' depending on release_date_precision
+    formats = {'year': '%Y', 'month': '%Y-%m', 'day': '%Y-%m-%d'}
+    date_format = formats.get(album.get('release_date_precision', 'day'), '%Y-%m-%d')
+    return datetime.strptime(album['release_date'], date_format).date()
+
+
+def iter_new_releases(sp, cutoff, countries=None):
+    # Yields recent albums page by page across markets, each album once.
+    # The feed is only roughly ordered by date, so a market stops at the first page with no recent album.
+    seen_album_ids = set()
+    with scheduled(sp) as sp:
+        for country in countries or params['countries']:
+            offset = params['offset']
+            while True:
+                logging.debug(f"Retrieving new releases for {country} at offset {offset}...")
+                page = sp.new_releases(country=country, limit=params['limit'], offset=offset)['albums']
+                recent = 0
+                for album in page['items']:
+                    if parse_release_date(album) < cutoff:
+                        continue
+                    recent += 1
+                    if album['id'] not in seen_album_ids:
+                        seen_album_ids.add(album['id'])
+                        yield album
+                if not page['items'] or not page.get('next') or recent == 0:
+                    break
+                offset += len(page['items'])
+
+
+def fetch_artist_details(sp, artist_id, cache=None):
+    logging.debug(f"Fetching artist details for artist ID: {artist_id}")
+    with scheduled(sp) as sp:
+        return cached_fetch(cache, 'artist', [artist_id], lambda ids: {artist_id: sp.artist(artist_id)})[artist_id]
+
+
+def fetch_track_details(sp, track_id, cache=None):
+    logging.debug(f"Fetching track details for track ID: {track_id}")
+    with scheduled(sp) as sp:
+        return cached_fetch(cache, 'track', [track_id], lambda ids: {track_id: sp.track(track_id)})[track_id]
+
+
+def request_artists(sp, artist_ids):
+    # Returns a dict of artist ID -> full artist object, using one request per 50 IDs
+    artists = {}
+    batches = list(chunked(artist_ids, ARTISTS_BATCH_SIZE))
+    logging.debug(f"Fetching artist details for {len(artist_ids)} artists in {len(batches)} requests")
+    with scheduled(sp) as sp:
+        responses = sp.map('artists', [(batch,) for batch in batches])
+    for response in responses:
+        for artist in response['artists']:
+            if artist:
+                artists[artist['id']] = artist
+    return artists
+
+
+def request_tracks(sp, track_ids):
+    # Returns a dict of track ID -> full track object, using one request per 50 IDs
+    tracks = {}
+    batches = list(chunked(track_ids, TRACKS_BATCH_SIZE))
+    logging.debug(f"Fetching track details for {len(track_ids)} tracks in {len(batches)} requests")
+    with scheduled(sp) as sp:
+        responses = sp.map('tracks', [(batch,) for batch in batches])
+    for response in responses:
+        for track in response['tracks']:
+            if track:
+                tracks[track['id']] = track
+    return tracks
+
+
+def request_albums_tracks(sp, album_ids):
+    # Returns a dict of album ID -> list of simplified tracks, using one request per 20 albums.
+    # Albums embed their first page of tracks; longer albums are paged with sp.next.
+    albums_tracks = {}
+    batches = list(chunked(album_ids, ALBUMS_BATCH_SIZE))
+    logging.debug(f"Fetching tracks for {len(album_ids)} albums in {len(batches)} requests")
+    with scheduled(sp) as sp:
+        for response in sp.map('albums', [(batch,) for batch in batches]):
+            for album in response['albums']:
+                if not album:
+                    continue
+                page = album['tracks']
+                items = list(page['items'])
+                while page.get('next'):
+                    page = sp.next(page)
+                    items.extend(page['items'])
+                albums_tracks[album['id']] = items
+    return albums_tracks
+
+
+def fetch_artists_details(sp, artist_ids, cache=None):
+    with scheduled(sp) as sp:
+        return cached_fetch(cache, 'artist', artist_ids, lambda ids: request_artists(sp, ids))
+
+
+def fetch_tracks_details(sp, track_ids, cache=None):
+    with scheduled(sp) as sp:
+        return cached_fetch(cache, 'track', track_ids, lambda ids: request_tracks(sp, ids))
+
+
+def fetch_albums_tracks(sp, album_ids, cache=None):
+    with scheduled(sp) as sp:
+        return cached_fetch(cache, 'album_tracks', album_ids, lambda ids: request_albums_tracks(sp, ids))
+
+
+def iter_resolved_tracks(sp, genres, cache=None, countries=None):
+    # Streams new releases once and yields a (genre, song_info) pair for every track of every requested
+    # genre, album batch by album batch, as soon as the batch is resolved
+    with scheduled(sp) as sp:
+        yield from _iter_resolved_tracks(sp, genres, cache, countries)
+
+
+def _iter_resolved_tracks(sp, genres, cache, countries):
+    logging.info(f"Starting to resolve tracks for genres: {', '.join(genres)}")
 
     # Get current date
     current_date = datetime.now().date()
     logging.info(f"Current date: {current_date}")
 
-    # Calculate the date three months ago
-    three_months_ago = current_date - timedelta(days=90)
-    logging.info(f"Date three months ago: {three_months_ago}")
+    # Calculate the release date cutoff
+    cutoff = current_date - timedelta(days=params['max_age_days'])
+    logging.info(f"Release date cutoff: {cutoff}")
 
-    # Make the API call to retrieve new releases
-    logging.info("Retrieving new releases...")
-    new_releases = sp.new_releases(country='US', limit=50, offset=0)
-
-    top_tracks = []
     artist_genre_cache = {}
-
-    # Filter albums by release date
-    recent_albums = [album for album in new_releases['albums']['items']
-                     if datetime.strptime(album['release_date'], '%Y-%m-%d').date() >= three_months_ago]
-
-    logging.info(f"Filtered {len(recent_albums)} recent albums.")
-
-    pprint.pprint(recent_albums)
-
-    # Fetch artist genres sequentially
-    for album in recent_albums:
-        artist_id = album['artists'][0]['id']
-        if artist_id not in artist_genre_cache:
-            artist_details = fetch_artist_details(sp, artist_id)
-            artist_genre_cache[artist_id] = [g.lower() for g in artist_details['genres']]
-
-    logging.info(f"Fetched genres for {len(artist_genre_cache)} artists.")
-
-    # Fetch tracks and populate top_tracks list
-    for album in recent_albums:
-        artist_id = album['artists'][0]['id']
-        if genre.lower() in artist_genre_cache.get(artist_id, []):
-            logging.info(f"Fetching tracks for album: {album['name']} (ID: {album['id']})")
-            album_tracks = sp.album_tracks(album['id'])
-            for track in album_tracks['items']:
-                track_details = fetch_track_details(sp, track['id'])
-                song_info = {
-                    'name': track_details['name'],
-                    'artists': ', '.join([artist['name'] for artist in track_details['artists']]),
-                    'album': album['name'],
-                    'release_date': album['release_date'],
-                    'duration_ms': track_details['duration_ms'],
-                    'popularity': track_details['popularity'],
-                    'track_id': track_details['id'],
-                }
-                top_tracks.append(song_info)
-                logging.info(f"Added track: {track_details['name']} by {track_details['artists'][0]['name']}")
+    album_count = 0
+
+    # Resolve albums in batches as the new-releases pages arrive
+    for albums in chunked(iter_new_releases(sp, cutoff, countries), ARTISTS_BATCH_SIZE):
+        album_count += len(albums)
+        logging.debug(f"Resolving {len(albums)} recent albums: {', '.join(album['name'] for album in albums)}")
+
+        with run_metrics.timed('resolve_batch', albums=len(albums)):
+            # Fetch genres for artists not seen in earlier batches
+            new_artist_ids = [album['artists'][0]['id'] for album in albums
+                              if album['artists'][0]['id'] not in artist_genre_cache]
+            for artist_id, artist in fetch_artists_details(sp, new_artist_ids, cache).items():
+                artist_genre_cache[artist_id] = {g.lower() for g in artist['genres']}
+
+            # Bucket albums into every requested genre their main artist belongs to
+            album_genres = {}
+            for album in albums:
+                artist_genres = artist_genre_cache.get(album['artists'][0]['id'], set())
+                matched = [genre for genre in genres if genre.lower() in artist_genres]
+                if matched:
+                    album_genres[album['id']] = (album, matched)
+
+            # Fetch album track lists, then full track details, in batches
+            albums_tracks = fetch_albums_tracks(sp, list(album_genres), cache)
+            track_ids = [track['id'] for album_id in album_genres for track in albums_tracks.get(album_id, [])]
+            tracks_details = fetch_tracks_details(sp, track_ids, cache)
+        run_metrics.count('albums_resolved', len(albums))
+
+        # Populate top_tracks lists
+        for album_id, (album, matched) in album_genres.items():
+            for track in albums_tracks.get(album_id, []):
+                track_details = tracks_details.get(track['id'])
+                if track_details is None:
+                    continue
+                for genre in matched:
+                    song_info = {
+                        'name': track_details['name'],
+                        'artists': ', '.join([artist['name'] for artist in track_details['artists']]),
+                        'album': album['name'],
+                        'release_date': parse_release_date(album).isoformat(),
+                        'release_date_precision': album.get('release_date_precision', 'day'),
+                        'duration_ms': track_details['duration_ms'],
+                        'popularity': track_details['popularity'],
+                        'track_id': track_details['id'],
+                    }
+                    yield genre, song_info
+                logging.debug(f"Added track: {track_details['name']} by {track_details['artists'][0]['name']}")
+
+    logging.info(f"Resolved {album_count} recent albums and {len(artist_genre_cache)} artists.")
+    logging.info(f"Made {sp.api_call_count()} Spotify API calls so far.")
+
+
+@run_metrics.timed('get_top_tracks')
+def get_top_tracks_by_genre(sp, genres, cache=None, countries=None):
+    # Returns a dict of genre -> tracks sorted by popularity, from a single pass over new releases
+    top_tracks = {genre: [] for genre in genres}
+    with scheduled(sp) as sp:
+        for genre, song_info in iter_resolved_tracks(sp, genres, cache, countries):
+            top_tracks[genre].append(song_info)
 
     # Sort the tracks by popularity in descending order
-    top_tracks.sort(key=lambda x: x['popularity'], reverse=True)
+    for genre_tracks in top_tracks.values():
+        genre_tracks.sort(key=lambda x: x['popularity'], reverse=True)
 
     logging.info("Tracks sorted by popularity.")
     return top_tracks
 
 
-def download_track(track_id, folder_path):
-    try:
-        # Use spotdl to download the track
-        subprocess.run(['spotdl', 'spotify:track:' + track_id, '--output', folder_path], check=True)
-        return True
-    except Exception as e:
-        logging.error(f"Error downloading track: {str(e)}")
-        return False
+def get_top_tracks(sp, genre, cache=None, countries=None):
+    return get_top_tracks_by_genre(sp, [genre], cache, countries)[genre]
 
 
-def download_top_tracks(top_tracks, genre, week_number):
-    folder_name = f"Playlist_week_{week_number}_{genre}"
-    os.makedirs(folder_name, exist_ok=True)
-    logging.info(f"Created folder: {folder_name}")
-
-    for idx, track in enumerate(top_tracks, start=1):
-        track_name = f"{idx}. {track['name']} - {track['artists']}.mp3"
-        track_id = track['track_id']
-        logging.info(f"Downloading track: {track['name']} by {track['artists']}")
-        success = download_track(track_id, folder_name)
-        if success:
-            logging.info(f"Downloaded track to: {folder_name}")
-        else:
-            logging.warning(f"Failed to download track: {track['name']} by {track['artists']}")
+def make_week_key(week_number, iso_year=None):
+    # Manifest key for a week; the ISO year defaults to the current one so weeks of different years don't collide
+    iso_year = iso_year or datetime.now().isocalendar()[0]
+    return f"{iso_year}-W{week_number:02d}"
 
 
-def download_weekly_genre_playlist(genres):
-    sp = authenticate_spotify()
-
-    # Load PostgreSQL credentials
-    postgres_host, postgres_port, postgres_db, postgres_user, postgres_password = load_credentials_postgres()
-
-    # Connect to the database
-    conn = psycopg2.connect(host=postgres_host, port=postgres_port, database=postgres_db, user=postgres_user,
-                            password=postgres_password)
-    cur = conn.cursor()
+def download_track(track_id, folder_path, engine=None):
+    # Use spotdl to download the track
+    engine = engine or DownloadEngine()
+    return engine.download_batch([track_id], folder_path)[0]['success']
 
-    # Get current date and week number
-    current_date = datetime.now()
-    week_number = current_date.isocalendar()[1]
-
-    for genre in genres:
-        logging.info(f"Processing genre: {genre}")
 
-        # Get top tracks for the genre
-        logging.info(f"Retrieving top tracks for genre: {genre}")
-        top_tracks = get_top_tracks(sp, genre)
+def playlist_folder(genre, week_number):
+    return f"Playlist_week_{week_number}_{genre}"
 
-        # Download top tracks
-        download_top_tracks(top_tracks, genre, week_number)
 
-        # Insert tracks into database
-        for track in top_tracks:
-            # Insert track information into the database
-            insert_query = sql.SQL(
-                "INSERT INTO wizeplaylist.weekly_playlist (name, album, release_date, duration_ms, popularity, artist, week_nb, genre) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)")
-            cur.execute(insert_query, (
-                track['name'], track['album'], track['release_date'], track['duration_ms'], track['popularity'],
-                track['artists'], week_number, genre))
-            conn.commit()
-            logging.info(f"Inserted track into database: {track['name']}")
+@run_metrics.timed('download_top_tracks')
+def download_top_tracks(top_tracks, genre, week_number, engine=None, manifest=None, week_key=None, files=None):
+    # `files` is an index_track_files() scan of the folder taken earlier, to avoid rescanning per call
+    folder_name = playlist_folder(genre, week_number)
+    os.makedirs(folder_name, exist_ok=True)
 
-    # Close the database connection
-    cur.close()
-    conn.close()
-    logging.info("Database connection closed.")
+    engine = engine or DownloadEngine()
+    week_key = week_key or make_week_key(week_number)
+
+    # Skip tracks whose file is already complete; truncated files are removed and fetched again
+    pending = []
+    present = {}
+    files = index_track_files(folder_name) if files is None else files
+    for track in top_tracks:
+        path = files.get(track['track_id'])
+        if path and is_complete_download(path, track['duration_ms']):
+            present[track['track_id']] = path
+            continue
+        if path:
+            logging.warning(f"Removing truncated download: {path}")
+            os.remove(path)
+        pending.append(track)
+    logging.debug(f"{len(present)} tracks already downloaded, downloading {len(pending)} to: {folder_name}")
+
+    results = engine.download([track['track_id'] for track in pending], folder_name)
+
+    tracks_by_id = {track['track_id']: track for track in pending}
+    downloaded = {}
+    failed = []
+    for result in results:
+        track = tracks_by_id[result['track_id']]
+        path = result['path']
+        if result['success'] and is_complete_download(path, track['duration_ms']):
+            downloaded[track['track_id']] = path
+        else:
+            result['success'] = False
+            failed.append(track['track_id'])
+            logging.warning(f"Failed to download track: {track['name']} by {track['artists']}")
+    if manifest:
+        # One manifest write per call; failures are unmarked in case an earlier run had marked them
+        files_by_id = {**present, **downloaded}
+        manifest.mark('downloaded', week_key, genre, list(files_by_id), files_by_id)
+        manifest.unmark('downloaded', week_key, genre, failed)
+    run_metrics.count('tracks_skipped', len(present))
+    run_metrics.count('tracks_downloaded', len(downloaded))
+    run_metrics.count('download_failures', len(results) - len(downloaded))
+    return results
+
+
+@run_metrics.timed('insert')
+def store_top_tracks(storage, top_tracks, genre, week_number, manifest=None, week_key=None):
+    # Stores tracks that earlier runs have not stored yet, in one transaction
+    week_key = week_key or make_week_key(week_number)
+    stored = manifest.completed('stored', week_key, genre) if manifest else set()
+    new_tracks = [track for track in top_tracks if track['track_id'] not in stored]
+    storage.write_tracks(new_tracks, week_number, genre)
+    if manifest:
+        manifest.mark('stored', week_key, genre, [track['track_id'] for track in new_tracks])
+    run_metrics.count('rows_stored', len(new_tracks))
+
+
+def write_playlist_file(tracks, genre, week_number):
+    # Numbers the playlist by popularity, whatever order the downloads finished in; returns the tracks in that order
+    folder_name = playlist_folder(genre, week_number)
+    playlist_path = os.path.join(folder_name, f"{folder_name}.m3u")
+    ordered = sorted(tracks, key=lambda x: x['popularity'], reverse=True)
+    files = index_track_files(folder_name)
+    with open(playlist_path, 'w', encoding='utf-8') as playlist_file:
+        playlist_file.write("#EXTM3U\n")
+        for position, track in enumerate(ordered, start=1):
+            path = files.get(track['track_id'])
+            if path:
+                playlist_file.write(f"#EXTINF:{track['duration_ms'] // 1000},{position}. {track['artists']} - "
+                                    f"{track['name']}\n{os.path.basename(path)}\n")
+    logging.info(f"Wrote playlist: {playlist_path}")
+    return ordered
+
+
+def group_by_genre(items):
+    groups = {}
+    for genre, track in items:
+        groups.setdefault(genre, []).append(track)
+    return groups
+
+
+def download_weekly_genre_playlist(genres, cache_location='metadata_cache.db', download_workers=4,
+                                   manifest_path='run_manifest.db', storage=None, queue_size=200, sp=None,
+                                   engine=None, metrics_path=None):
+    # Everything opened here is closed when the run ends, or right away if a later step fails to open
+    with ExitStack() as opened:
+        # Connect to the PostgreSQL connection pool unless another storage backend is given
+        storage = storage or PostgresStorage(*load_credentials_postgres())
+        opened.callback(storage.close)
+        # Only close the scheduler if this run created it
+        if not isinstance(sp, SpotifyScheduler):
+            sp = SpotifyScheduler(sp or authenticate_spotify())
+            opened.callback(sp.close)
+        cache = open_metadata_cache(cache_location)
+        opened.callback(cache.close)
+        manifest = RunManifest(manifest_path)
+        opened.callback(manifest.close)
+        resources = opened.pop_all()
+    engine = engine or DownloadEngine(max_workers=1)
+
+    # Emit stage timings and counters as JSON lines so regressions can be tracked across runs
+    metrics_hook = JsonLinesHook(metrics_path) if metrics_path else None
+    if metrics_hook:
+        run_metrics.add_hook(metrics_hook)
+
+    # Get current date and week number; the manifest key includes the ISO year so weeks don't collide
+    current_date = datetime.now()
+    iso_year, week_number, _ = current_date.isocalendar()
+    week_key = make_week_key(week_number, iso_year)
+
+    resolved = {genre: [] for genre in genres}
+    undownloaded = {genre: [] for genre in genres}
+    # One folder scan per genre up front; each download call then only scans after its own spotdl run
+    existing_files = {genre: index_track_files(playlist_folder(genre, week_number)) for genre in genres}
+
+    def record_resolved(batch):
+        # Holds tracks back per genre until there are enough for one full spotdl invocation
+        chunks = []
+        for genre, tracks in group_by_genre(batch).items():
+            resolved[genre].extend(tracks)
+            manifest.mark('resolved', week_key, genre, [track['track_id'] for track in tracks])
+            pending = undownloaded[genre]
+            pending.extend(tracks)
+            while len(pending) >= engine.batch_size:
+                chunks.append((genre, pending[:engine.batch_size]))
+                del pending[:engine.batch_size]
+        return chunks
+
+    def flush_resolved():
+        return [(genre, tracks) for genre, tracks in undownloaded.items() if tracks]
+
+    def download(batch):
+        # Each item is one genre's chunk of tracks, downloaded by a single spotdl invocation
+        downloaded = []
+        for genre, tracks in batch:
+            download_top_tracks(tracks, genre, week_number, engine, manifest, week_key, existing_files[genre])
+            downloaded.extend((genre, track) for track in tracks)
+        return downloaded
+
+    def store(batch):
+        # One transaction per genre and batch
+        for genre, tracks in group_by_genre(batch).items():
+            store_top_tracks(storage, tracks, genre, week_number, manifest, week_key)
+
+    # Resolve, download and store tracks concurrently; each stage starts on a track as soon as it is ready
+    # Stages are named after the matching timings of a serial run; the source resolves the tracks
+    pipeline = Pipeline(queue_size=queue_size, source_name='get_top_tracks')
+    pipeline.add_stage('group', record_resolved, batch_size=50, flush=flush_resolved)
+    pipeline.add_stage('download_top_tracks', download, workers=download_workers)
+    pipeline.add_stage('insert', store, batch_size=500, batch_timeout=2.0)
+    try:
+        with run_metrics.timed('pipeline'):
+            pipeline.run(iter_resolved_tracks(sp, genres, cache))
+    finally:
+        # Recorded even when the run fails, so the partial stage metrics are not lost
+        run_metrics.record_pipeline(pipeline.metrics(), week=week_key)
+        # Close the database connections, scheduler, cache and manifest
+        resources.close()
+        logging.info("Database connection closed.")
+        if metrics_hook:
+            run_metrics.remove_hook(metrics_hook)
+
+    top_tracks = {}
+    for genre, tracks in resolved.items():
+        logging.info(f"Processed genre: {genre} ({len(tracks)} tracks)")
+        top_tracks[genre] = write_playlist_file(tracks, genre, week_number)
+
+    logging.info(f"Total Spotify API calls this run: {sp.api_call_count()}")
+    for endpoint, stats in sp.stats().items():
+        logging.info(f"Spotify endpoint {endpoint}: {stats}")
+
+    logging.info(f"Metadata cache: {cache.stats()}")
+    run_metrics.log_summary()
+    return top_tracks
 
 
 def main():
@@ -194,7 +465,7 @@ def main():
     sp = authenticate_spotify()
     logging.info(f"Most Listened Songs in the {genre.capitalize()} Genre Released in the Last 3 Months on Spotify:")
     logging.info(genre)
-    download_weekly_genre_playlist([genre])
+    download_weekly_genre_playlist([genre], sp=sp)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,176 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import Counter
+
+# Seconds each kind of entity stays fresh. Track popularity moves daily, genres and track lists rarely do.
+DEFAULT_TTLS = {
+    'artist': 7 * 24 * 3600,
+    'album_tracks': 30 * 24 * 3600,
+    'track': 24 * 3600,
+}
+
+
+class SQLiteCacheBackend:
+    """Local on-disk backend; least recently read entries are evicted past `max_entries`."""
+
+    def __init__(self, path='metadata_cache.db', max_entries=100000):
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS metadata_cache ("
+            "entity TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+            "expires_at REAL NOT NULL, accessed_at REAL NOT NULL, PRIMARY KEY (entity, key))")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS metadata_cache_accessed ON metadata_cache (accessed_at)")
+        self.conn.commit()
+
+    def get_many(self, entity, keys):
+        now = time.time()
+        found = {}
+        with self.lock:
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i + 500]
+                placeholders = ', '.join('?' * len(batch))
+                rows = self.conn.execute(
+                    f"SELECT key, value FROM metadata_cache WHERE entity = ? AND key IN ({placeholders}) "
+                    f"AND expires_at > ?", [entity, *batch, now]).fetchall()
+                found.update((key, json.loads(value)) for key, value in rows)
+            if found:
+                self.conn.executemany("UPDATE metadata_cache SET accessed_at = ? WHERE entity = ? AND key = ?",
+                                      [(now, entity, key) for key in found])
+                self.conn.commit()
+        return found
+
+    def set_many(self, entity, items, ttl):
+        now = time.time()
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO metadata_cache (entity, key, value, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(entity, key, json.dumps(value), now + ttl, now) for key, value in items.items()])
+            self.conn.execute("DELETE FROM metadata_cache WHERE expires_at <= ?", (now,))
+            self.conn.execute(
+                "DELETE FROM metadata_cache WHERE rowid IN ("
+                "SELECT rowid FROM metadata_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,))
+            self.conn.commit()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class RedisCacheBackend:
+    """Shared Redis backend; expiry is native, LRU order is kept in a sorted set of access times.
+
+    A second sorted set holds expiry times, so entries Redis has expired are dropped from the LRU
+    set too and never count towards `max_entries`.
+    """
+
+    def __init__(self, url='redis://localhost:6379/0', max_entries=100000, prefix='wizemusicfinder'):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.max_entries = max_entries
+        self.prefix = prefix
+        self.lru_key = f"{prefix}:lru"
+        self.expiry_key = f"{prefix}:expiry"
+
+    def _key(self, entity, key):
+        return f"{self.prefix}:{entity}:{key}"
+
+    def _forget(self, redis_keys):
+        pipe = self.client.pipeline()
+        pipe.zrem(self.lru_key, *redis_keys)
+        pipe.zrem(self.expiry_key, *redis_keys)
+        pipe.execute()
+
+    def get_many(self, entity, keys):
+        if not keys:
+            return {}
+        redis_keys = [self._key(entity, key) for key in keys]
+        values = self.client.mget(redis_keys)
+        found = {key: json.loads(value) for key, value in zip(keys, values) if value is not None}
+        if found:
+            now = time.time()
+            self.client.zadd(self.lru_key, {self._key(entity, key): now for key in found}, xx=True)
+        missing = [redis_key for redis_key, value in zip(redis_keys, values) if value is None]
+        if missing:
+            self._forget(missing)
+        return found
+
+    def set_many(self, entity, items, ttl):
+        if not items:
+            return
+        now = time.time()
+        pipe = self.client.pipeline()
+        for key, value in items.items():
+            pipe.set(self._key(entity, key), json.dumps(value), px=max(1, int(ttl * 1000)))
+        pipe.zadd(self.lru_key, {self._key(entity, key): now for key in items})
+        pipe.zadd(self.expiry_key, {self._key(entity, key): now + ttl for key in items})
+        pipe.execute()
+
+        expired = self.client.zrangebyscore(self.expiry_key, '-inf', now)
+        if expired:
+            self._forget(expired)
+        overflow = self.client.zcard(self.lru_key) - self.max_entries
+        if overflow > 0:
+            evicted = [key for key, _ in self.client.zpopmin(self.lru_key, overflow)]
+            self.client.zrem(self.expiry_key, *evicted)
+            self.client.delete(*evicted)
+
+    def close(self):
+        self.client.close()
+
+
+class MetadataCache:
+    """TTL cache of Spotify metadata keyed by (entity, Spotify ID), with hit/miss counters per entity."""
+
+    def __init__(self, backend, ttls=None):
+        self.backend = backend
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.hits = Counter()
+        self.misses = Counter()
+
+    def get_many(self, entity, keys):
+        keys = list(dict.fromkeys(keys))
+        found = self.backend.get_many(entity, keys)
+        self.hits[entity] += len(found)
+        self.misses[entity] += len(keys) - len(found)
+        return found
+
+    def set_many(self, entity, items):
+        self.backend.set_many(entity, items, self.ttls[entity])
+
+    def stats(self):
+        return {entity: {'hits': self.hits[entity], 'misses': self.misses[entity]}
+                for entity in sorted(set(self.hits) | set(self.misses))}
+
+    def close(self):
+        self.backend.close()
+
+
+def open_metadata_cache(location='metadata_cache.db', max_entries=100000, ttls=None):
+    # A redis:// URL selects the Redis backend, anything else is a SQLite file path
+    if location.startswith(('redis://', 'rediss://', 'unix://')):
+        backend = RedisCacheBackend(location, max_entries=max_entries)
+    else:
+        backend = SQLiteCacheBackend(location, max_entries=max_entries)
+    logging.info(f"Opened metadata cache: {location}")
+    return MetadataCache(backend, ttls)
+
+
+def cached_fetch(cache, entity, keys, fetch_missing):
+    # Returns a dict of key -> value for `keys`, calling fetch_missing(missing_keys) only for cache misses
+    if cache is None:
+        return fetch_missing(list(dict.fromkeys(keys)))
+    found = cache.get_many(entity, keys)
+    missing = [key for key in dict.fromkeys(keys) if key not in found]
+    if missing:
+        fetched = fetch_missing(missing)
+        cache.set_many(entity, fetched)
+        found.update(fetched)
+    return found
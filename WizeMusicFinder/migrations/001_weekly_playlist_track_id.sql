@@ -0,0 +1,10 @@
+-- Adds the Spotify track ID and the unique key PostgresStorage upserts on.
+-- Run once per database before deploying: psql -f migrations/001_weekly_playlist_track_id.sql
+BEGIN;
+
+ALTER TABLE wizeplaylist.weekly_playlist ADD COLUMN IF NOT EXISTS track_id TEXT;
+
+CREATE UNIQUE INDEX IF NOT EXISTS weekly_playlist_track_week_genre
+    ON wizeplaylist.weekly_playlist (track_id, week_nb, genre);
+
+COMMIT;
@@ -0,0 +1,228 @@
+import logging
+import queue
+import threading
+import time
+
+# Marks the end of a stage's input; each worker consumes exactly one
+_DONE = object()
+
+# How often blocked workers wake up to check for cancellation, in seconds
+_POLL_INTERVAL = 0.1
+
+# How long a cancelled run waits for each thread; the source may be blocked on the network
+_CANCEL_TIMEOUT = 10.0
+
+
+class PipelineCancelled(Exception):
+    pass
+
+
+class StageMetrics:
+    def __init__(self, name):
+        self.name = name
+        self.lock = threading.Lock()
+        self.received = 0
+        self.emitted = 0
+        self.batches = 0
+        self.busy_seconds = 0.0
+        self.max_queue_depth = 0
+        self.started = None
+        self.finished = None
+
+    def as_dict(self, queue_depth):
+        # wall_seconds runs from the stage's first item to its end; busy_seconds sums every worker's handler time
+        elapsed = ((self.finished or time.perf_counter()) - self.started) if self.started else 0.0
+        return {
+            'received': self.received,
+            'emitted': self.emitted,
+            'batches': self.batches,
+            'wall_seconds': elapsed,
+            'busy_seconds': self.busy_seconds,
+            'queue_depth': queue_depth,
+            'max_queue_depth': self.max_queue_depth,
+            'throughput': self.received / elapsed if elapsed else 0.0,
+        }
+
+
+class Stage:
+    def __init__(self, name, handler, workers, batch_size, batch_timeout, queue_size, flush=None):
+        self.name = name
+        self.handler = handler
+        self.flush = flush
+        self.workers = workers
+        self.batch_size = batch_size
+        self.batch_timeout = batch_timeout
+        self.inbox = queue.Queue(maxsize=queue_size)
+        self.metrics = StageMetrics(name)
+        self.running_workers = workers
+
+
+class Pipeline:
+    """Staged producer/consumer pipeline over bounded queues.
+
+    Each stage's handler takes a list of up to `batch_size` items and returns the items to pass
+    to the next stage. A stage's optional `flush` is called once after its input is drained and
+    returns any items it held back. Full queues block upstream stages (backpressure); `cancel` or
+    an error in any stage stops every worker at its next item.
+    """
+
+    def __init__(self, queue_size=100, source_name='source'):
+        self.queue_size = queue_size
+        self.stages = []
+        self.cancelled = threading.Event()
+        self.errors = []
+        self.source_metrics = StageMetrics(source_name)
+
+    def add_stage(self, name, handler, workers=1, batch_size=1, batch_timeout=0.0, flush=None):
+        self.stages.append(Stage(name, handler, workers, batch_size, batch_timeout, self.queue_size, flush))
+        return self
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def _put(self, stage, item):
+        while not self.cancelled.is_set():
+            try:
+                stage.inbox.put(item, timeout=_POLL_INTERVAL)
+            except queue.Full:
+                continue
+            stage.metrics.max_queue_depth = max(stage.metrics.max_queue_depth, stage.inbox.qsize())
+            return
+        raise PipelineCancelled()
+
+    def _get_batch(self, stage):
+        # Returns (batch, done): waits for a first item, then takes whatever arrives within batch_timeout
+        batch = []
+        deadline = None
+        while len(batch) < stage.batch_size and not self.cancelled.is_set():
+            remaining = deadline - time.perf_counter() if batch else _POLL_INTERVAL
+            try:
+                if remaining > 0:
+                    item = stage.inbox.get(timeout=min(remaining, _POLL_INTERVAL))
+                else:
+                    item = stage.inbox.get_nowait()
+            except queue.Empty:
+                if batch and remaining <= 0:
+                    break
+                continue
+            if item is _DONE:
+                return batch, True
+            batch.append(item)
+            if deadline is None:
+                deadline = time.perf_counter() + stage.batch_timeout
+        if self.cancelled.is_set():
+            raise PipelineCancelled()
+        return batch, False
+
+    def _finish_stage(self, index):
+        stage = self.stages[index]
+        with stage.metrics.lock:
+            stage.running_workers -= 1
+            last = stage.running_workers == 0
+        if not last:
+            return
+        next_stage = self.stages[index + 1] if index + 1 < len(self.stages) else None
+        if stage.flush:
+            start = time.perf_counter()
+            outputs = list(stage.flush() or [])
+            with stage.metrics.lock:
+                stage.metrics.emitted += len(outputs)
+                stage.metrics.busy_seconds += time.perf_counter() - start
+            if next_stage:
+                for output in outputs:
+                    self._put(next_stage, output)
+        stage.metrics.finished = time.perf_counter()
+        if next_stage:
+            for _ in range(next_stage.workers):
+                self._put(next_stage, _DONE)
+
+    def _run_worker(self, index):
+        stage = self.stages[index]
+        next_stage = self.stages[index + 1] if index + 1 < len(self.stages) else None
+        try:
+            while True:
+                batch, done = self._get_batch(stage)
+                if batch:
+                    start = time.perf_counter()
+                    with stage.metrics.lock:
+                        stage.metrics.started = stage.metrics.started or start
+                    outputs = list(stage.handler(batch) or [])
+                    with stage.metrics.lock:
+                        stage.metrics.received += len(batch)
+                        stage.metrics.emitted += len(outputs)
+                        stage.metrics.batches += 1
+                        stage.metrics.busy_seconds += time.perf_counter() - start
+                    if next_stage:
+                        for output in outputs:
+                            self._put(next_stage, output)
+                if done:
+                    break
+            self._finish_stage(index)
+        except PipelineCancelled:
+            pass
+        except BaseException as e:
+            logging.exception(f"Pipeline stage {stage.name} failed")
+            self.errors.append(e)
+            self.cancel()
+
+    def _run_source(self, source):
+        metrics = self.source_metrics
+        first_stage = self.stages[0]
+        items = iter(source)
+        try:
+            while True:
+                # Only the time spent producing items counts as busy, not the time blocked on a full queue
+                start = time.perf_counter()
+                try:
+                    item = next(items)
+                except StopIteration:
+                    break
+                finally:
+                    metrics.busy_seconds += time.perf_counter() - start
+                metrics.emitted += 1
+                self._put(first_stage, item)
+            for _ in range(first_stage.workers):
+                self._put(first_stage, _DONE)
+        except PipelineCancelled:
+            pass
+        except BaseException as e:
+            logging.exception("Pipeline source failed")
+            self.errors.append(e)
+            self.cancel()
+        finally:
+            metrics.finished = time.perf_counter()
+
+    def run(self, source):
+        # Feeds `source` through every stage; blocks until all stages drain, then returns the metrics
+        self.source_metrics.started = time.perf_counter()
+        threads = [threading.Thread(target=self._run_source, args=(source,), name='pipeline-source', daemon=True)]
+        for index, stage in enumerate(self.stages):
+            threads += [threading.Thread(target=self._run_worker, args=(index,), name=f"pipeline-{stage.name}-{n}",
+                                         daemon=True) for n in range(stage.workers)]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(_POLL_INTERVAL)
+        except KeyboardInterrupt:
+            logging.warning("Cancelling pipeline...")
+            self.cancel()
+            for thread in threads:
+                thread.join(_CANCEL_TIMEOUT)
+            raise
+        if self.errors:
+            raise self.errors[0]
+        return self.metrics()
+
+    def metrics(self):
+        source = self.source_metrics
+        metrics = {source.name: {
+            'emitted': source.emitted,
+            'wall_seconds': ((source.finished or time.perf_counter()) - source.started) if source.started else 0.0,
+            'busy_seconds': source.busy_seconds,
+        }}
+        for stage in self.stages:
+            with stage.metrics.lock:
+                metrics[stage.name] = stage.metrics.as_dict(stage.inbox.qsize())
+        return metrics
@@ -0,0 +1,71 @@
+import sqlite3
+import threading
+import time
+
+# Pipeline stages recorded per (track_id, week, genre), in the order a track passes through them
+STAGES = ('resolved', 'downloaded', 'stored')
+
+
+class RunManifest:
+    """On-disk record of which tracks each weekly run has resolved, downloaded and stored.
+
+    Reruns for the same week and genre consult `stored` to skip rows already written. `resolved`
+    and `downloaded` are kept for the record only: downloads are checked against the files on
+    disk instead, since a file can be deleted or truncated after it was marked.
+    """
+
+    def __init__(self, path='run_manifest.db'):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        # Commits happen per downloaded batch; WAL without a sync per commit keeps them cheap, and a
+        # commit lost to a crash only means a rerun checks those files again
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS run_manifest ("
+            "track_id TEXT NOT NULL, week TEXT NOT NULL, genre TEXT NOT NULL, "
+            "resolved_at REAL, downloaded_at REAL, stored_at REAL, file_path TEXT, "
+            "PRIMARY KEY (track_id, week, genre))")
+        self.conn.commit()
+
+    def mark(self, stage, week, genre, track_ids, file_paths=None):
+        if stage not in STAGES:
+            raise ValueError(f"Unknown manifest stage: {stage}")
+        if not track_ids:
+            return
+        now = time.time()
+        file_paths = file_paths or {}
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO run_manifest (track_id, week, genre) VALUES (?, ?, ?)",
+                [(track_id, week, genre) for track_id in track_ids])
+            self.conn.executemany(
+                f"UPDATE run_manifest SET {stage}_at = ?, file_path = COALESCE(?, file_path) "
+                f"WHERE track_id = ? AND week = ? AND genre = ?",
+                [(now, file_paths.get(track_id), track_id, week, genre) for track_id in track_ids])
+            self.conn.commit()
+
+    def unmark(self, stage, week, genre, track_ids):
+        if stage not in STAGES:
+            raise ValueError(f"Unknown manifest stage: {stage}")
+        if not track_ids:
+            return
+        with self.lock:
+            self.conn.executemany(
+                f"UPDATE run_manifest SET {stage}_at = NULL WHERE track_id = ? AND week = ? AND genre = ?",
+                [(track_id, week, genre) for track_id in track_ids])
+            self.conn.commit()
+
+    def completed(self, stage, week, genre):
+        # Returns the set of track IDs that already went through `stage` for this week and genre
+        if stage not in STAGES:
+            raise ValueError(f"Unknown manifest stage: {stage}")
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT track_id FROM run_manifest WHERE week = ? AND genre = ? AND {stage}_at IS NOT NULL",
+                (week, genre)).fetchall()
+        return {track_id for track_id, in rows}
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,99 @@
+import json
+import logging
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+
+class RunMetrics:
+    """Thread-safe stage timings and counters for a run.
+
+    Every timing or count is also passed as an event dict to the registered hooks, so production
+    runs can ship them elsewhere (e.g. JsonLinesHook) to track regressions.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.timings = {}
+        self.counters = Counter()
+        self.pipeline = {}
+        self.hooks = []
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+
+    def remove_hook(self, hook):
+        self.hooks.remove(hook)
+
+    def emit(self, event):
+        for hook in list(self.hooks):
+            try:
+                hook(event)
+            except Exception as e:
+                logging.error(f"Metrics hook failed: {str(e)}")
+
+    @contextmanager
+    def timed(self, stage, **fields):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            with self.lock:
+                count, total, longest = self.timings.get(stage, (0, 0.0, 0.0))
+                self.timings[stage] = (count + 1, total + seconds, max(longest, seconds))
+            self.emit({'type': 'timing', 'stage': stage, 'seconds': seconds, 'time': time.time(), **fields})
+
+    def count(self, name, value=1, **fields):
+        with self.lock:
+            self.counters[name] += value
+        self.emit({'type': 'count', 'name': name, 'value': value, 'time': time.time(), **fields})
+
+    def record_pipeline(self, stages, **fields):
+        # Keeps a pipelined run's per-stage metrics; timings of concurrent calls add up, these give wall vs busy time
+        with self.lock:
+            self.pipeline = {stage: dict(stage_metrics) for stage, stage_metrics in stages.items()}
+        self.emit({'type': 'pipeline', 'stages': stages, 'time': time.time(), **fields})
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'timings': {stage: {'count': count, 'total': total, 'max': longest}
+                            for stage, (count, total, longest) in self.timings.items()},
+                'counters': dict(self.counters),
+                'pipeline': {stage: dict(stage_metrics) for stage, stage_metrics in self.pipeline.items()},
+            }
+
+    def reset(self):
+        with self.lock:
+            self.timings.clear()
+            self.counters.clear()
+            self.pipeline = {}
+
+    def log_summary(self):
+        snapshot = self.snapshot()
+        for stage, timing in snapshot['timings'].items():
+            logging.info(f"Stage {stage}: {timing['count']} calls, {timing['total']:.2f}s total, "
+                         f"{timing['max']:.2f}s max")
+        for name, value in snapshot['counters'].items():
+            logging.info(f"Counter {name}: {value}")
+        for stage, stage_metrics in snapshot['pipeline'].items():
+            logging.info(f"Pipeline stage {stage}: {stage_metrics['wall_seconds']:.2f}s wall, "
+                         f"{stage_metrics['busy_seconds']:.2f}s busy, {stage_metrics['emitted']} items out")
+
+
+class JsonLinesHook:
+    """Appends each metrics event as one JSON line to `path`."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def __call__(self, event):
+        with self.lock, open(self.path, 'a', encoding='utf-8') as metrics_file:
+            metrics_file.write(json.dumps(event, default=str) + '\n')
+
+
+# Metrics shared by the whole process; main.py records into it
+run_metrics = RunMetrics()
@@ -0,0 +1,206 @@
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import requests
+import spotipy
+from requests.exceptions import ConnectionError, Timeout
+from spotipy.exceptions import SpotifyException
+
+# HTTP statuses worth retrying; 429 is rate limiting, the rest are transient server errors
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+def parse_retry_after(value):
+    # Retry-After is either delta-seconds or an HTTP date; returns seconds to wait, or None if unparseable
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class TokenBucket:
+    """Shared rate limiter: `rate` requests per second with bursts of up to `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                else:
+                    self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                    self.updated = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        # Block every caller until Spotify's Retry-After window has passed
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0
+            self.updated = self.paused_until
+
+
+class EndpointStats:
+    def __init__(self):
+        self.calls = 0
+        self.retries = 0
+        self.errors = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def as_dict(self):
+        return {
+            'calls': self.calls,
+            'retries': self.retries,
+            'errors': self.errors,
+            'avg_latency': self.total_latency / self.calls if self.calls else 0.0,
+            'max_latency': self.max_latency,
+        }
+
+
+class SpotifyScheduler:
+    """Runs spotipy calls on a thread pool, sharing one token bucket and honouring Retry-After.
+
+    Endpoints can be called as attributes (`scheduler.artists(ids)`) like on the wrapped
+    client, submitted for a Future with `submit`, or fanned out with `map`. A Retry-After longer
+    than `max_retry_after` seconds fails the call instead of stalling every worker.
+    """
+
+    def __init__(self, sp, max_workers=8, rate=10.0, burst=10, max_retries=5, max_backoff=30.0,
+                 max_retry_after=300.0):
+        self.sp = sp
+        self.max_retries = max_retries
+        self.max_backoff = max_backoff
+        self.max_retry_after = max_retry_after
+        self.bucket = TokenBucket(rate, burst)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='spotify')
+        self.stats_lock = threading.Lock()
+        self.endpoint_stats = {}
+
+    def __getattr__(self, endpoint):
+        sp = self.__dict__.get('sp')
+        if endpoint.startswith('_') or not callable(getattr(sp, endpoint, None)):
+            raise AttributeError(endpoint)
+        return lambda *args, **kwargs: self.call(endpoint, *args, **kwargs)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+    def _record(self, endpoint, latency=None, retried=False, failed=False):
+        with self.stats_lock:
+            stats = self.endpoint_stats.setdefault(endpoint, EndpointStats())
+            if latency is not None:
+                stats.calls += 1
+                stats.total_latency += latency
+                stats.max_latency = max(stats.max_latency, latency)
+            if retried:
+                stats.retries += 1
+            if failed:
+                stats.errors += 1
+
+    def _backoff(self, attempt, error):
+        retry_after = None
+        if isinstance(error, SpotifyException) and error.headers:
+            retry_after = parse_retry_after(error.headers.get('Retry-After'))
+        if retry_after is not None:
+            return retry_after
+        return min(self.max_backoff, 0.5 * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+    def call(self, endpoint, *args, **kwargs):
+        method = getattr(self.sp, endpoint)
+        attempt = 0
+        while True:
+            self.bucket.acquire()
+            start = time.perf_counter()
+            try:
+                result = method(*args, **kwargs)
+            except (SpotifyException, ConnectionError, Timeout) as e:
+                self._record(endpoint, time.perf_counter() - start)
+                retryable = not isinstance(e, SpotifyException) or e.http_status in RETRY_STATUSES
+                if not retryable or attempt >= self.max_retries:
+                    self._record(endpoint, failed=True)
+                    raise
+                delay = self._backoff(attempt, e)
+                if delay > self.max_retry_after:
+                    logging.error(f"Spotify {endpoint} asked to retry after {delay:.0f}s, "
+                                  f"more than the {self.max_retry_after:.0f}s limit; giving up")
+                    self._record(endpoint, failed=True)
+                    raise
+                if isinstance(e, SpotifyException) and e.http_status == 429:
+                    self.bucket.pause(delay)
+                    delay = 0
+                logging.warning(f"Spotify {endpoint} failed ({e}), retrying (attempt {attempt + 1})")
+                self._record(endpoint, retried=True)
+                attempt += 1
+                time.sleep(delay)
+                continue
+            self._record(endpoint, time.perf_counter() - start)
+            return result
+
+    def submit(self, endpoint, *args, **kwargs):
+        return self.executor.submit(self.call, endpoint, *args, **kwargs)
+
+    def map(self, endpoint, args_list):
+        # Runs `endpoint(*args)` for every args tuple concurrently, returning results in order
+        futures = [self.submit(endpoint, *args) for args in args_list]
+        return [future.result() for future in futures]
+
+    def stats(self):
+        with self.stats_lock:
+            return {endpoint: stats.as_dict() for endpoint, stats in self.endpoint_stats.items()}
+
+    def api_call_count(self):
+        with self.stats_lock:
+            return sum(stats.calls for stats in self.endpoint_stats.values())
+
+
+def build_spotify_client(**kwargs):
+    # spotipy's default session retries 429s inside urllib3 and then raises without the response headers,
+    # so Retry-After never reaches the scheduler. A plain session surfaces every 429 with its headers.
+    return spotipy.Spotify(requests_session=requests.Session(), **kwargs)
+
+
+@contextmanager
+def scheduled(sp):
+    # Yields `sp` if it is already a scheduler, else a new scheduler around it that is closed on exit
+    if isinstance(sp, SpotifyScheduler):
+        yield sp
+        return
+    scheduler = SpotifyScheduler(sp)
+    try:
+        yield scheduler
+    finally:
+        scheduler.close()
@@ -0,0 +1,119 @@
+import abc
+import logging
+import sqlite3
+import threading
+
+# Column order shared by every backend; `artist` holds the comma-joined artist names
+COLUMNS = ('track_id', 'name', 'album', 'release_date', 'duration_ms', 'popularity', 'artist', 'week_nb', 'genre')
+CONFLICT_KEY = ('track_id', 'week_nb', 'genre')
+
+
+def track_rows(tracks, week_number, genre):
+    # One row per conflict key, the last track winning: Postgres rejects an upsert that hits a key twice
+    rows = {}
+    for track in tracks:
+        rows[(track['track_id'], week_number, genre)] = (
+            track['track_id'], track['name'], track['album'], track['release_date'], track['duration_ms'],
+            track['popularity'], track['artists'], week_number, genre)
+    return list(rows.values())
+
+
+class TrackStorage(abc.ABC):
+    """Writes a genre's weekly playlist in one transaction, upserting on (track_id, week_nb, genre)."""
+
+    @abc.abstractmethod
+    def write_tracks(self, tracks, week_number, genre):
+        """Stores `tracks` and returns the number of rows written."""
+
+    def close(self):
+        pass
+
+
+class PostgresStorage(TrackStorage):
+    """Upserts through a connection pool; the table must have been migrated (see migrations/)."""
+
+    MIGRATION = 'migrations/001_weekly_playlist_track_id.sql'
+
+    def __init__(self, host, port, database, user, password, min_connections=1, max_connections=4,
+                 table='wizeplaylist.weekly_playlist'):
+        from psycopg2 import sql
+        from psycopg2.pool import ThreadedConnectionPool
+
+        self.table = table
+        columns = sql.SQL(', ').join(map(sql.Identifier, COLUMNS))
+        conflict_key = sql.SQL(', ').join(map(sql.Identifier, CONFLICT_KEY))
+        updates = sql.SQL(', ').join(sql.SQL("{0} = EXCLUDED.{0}").format(sql.Identifier(column))
+                                     for column in COLUMNS if column not in CONFLICT_KEY)
+        self.upsert_query = sql.SQL(
+            "INSERT INTO {table} ({columns}) VALUES %s ON CONFLICT ({conflict_key}) DO UPDATE SET {updates}").format(
+            table=sql.Identifier(*table.split('.')), columns=columns, conflict_key=conflict_key, updates=updates)
+        self.pool = ThreadedConnectionPool(min_connections, max_connections, host=host, port=port,
+                                           database=database, user=user, password=password)
+        self.check_schema()
+
+    def check_schema(self):
+        # Read-only startup check; the DDL lives in a one-off migration so startup never takes table locks
+        conn = self.pool.getconn()
+        try:
+            with conn, conn.cursor() as cur:
+                cur.execute(
+                    "SELECT EXISTS (SELECT 1 FROM pg_attribute WHERE attrelid = to_regclass(%(table)s) "
+                    "AND attname = 'track_id' AND NOT attisdropped), "
+                    "EXISTS (SELECT 1 FROM pg_index i WHERE i.indrelid = to_regclass(%(table)s) AND i.indisunique "
+                    "AND ARRAY(SELECT a.attname::text FROM unnest(i.indkey) AS k JOIN pg_attribute a "
+                    "ON a.attrelid = i.indrelid AND a.attnum = k ORDER BY a.attname) = %(key)s::text[])",
+                    {'table': self.table, 'key': sorted(CONFLICT_KEY)})
+                has_column, has_key = cur.fetchone()
+        finally:
+            self.pool.putconn(conn)
+        if not (has_column and has_key):
+            self.pool.closeall()
+            raise RuntimeError(f"{self.table} has no track_id column or no unique key on "
+                               f"({', '.join(CONFLICT_KEY)}); apply {self.MIGRATION} first")
+
+    def write_tracks(self, tracks, week_number, genre):
+        from psycopg2.extras import execute_values
+
+        rows = track_rows(tracks, week_number, genre)
+        if not rows:
+            return 0
+        conn = self.pool.getconn()
+        try:
+            # The connection context manager commits once for the whole batch, or rolls back on error
+            with conn, conn.cursor() as cur:
+                execute_values(cur, self.upsert_query, rows, page_size=500)
+        finally:
+            self.pool.putconn(conn)
+        logging.debug(f"Stored {len(rows)} tracks for genre {genre} in {self.table}")
+        return len(rows)
+
+    def close(self):
+        self.pool.closeall()
+
+
+class SQLiteStorage(TrackStorage):
+    def __init__(self, path='weekly_playlist.db', table='weekly_playlist'):
+        self.table = table
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} (track_id TEXT NOT NULL, name TEXT, album TEXT, "
+            f"release_date TEXT, duration_ms INTEGER, popularity INTEGER, artist TEXT, week_nb INTEGER NOT NULL, "
+            f"genre TEXT NOT NULL, PRIMARY KEY ({', '.join(CONFLICT_KEY)}))")
+        self.conn.commit()
+
+    def write_tracks(self, tracks, week_number, genre):
+        rows = track_rows(tracks, week_number, genre)
+        if not rows:
+            return 0
+        updates = ', '.join(f"{column} = excluded.{column}" for column in COLUMNS if column not in CONFLICT_KEY)
+        query = (f"INSERT INTO {self.table} ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))}) "
+                 f"ON CONFLICT ({', '.join(CONFLICT_KEY)}) DO UPDATE SET {updates}")
+        with self.lock, self.conn:
+            self.conn.executemany(query, rows)
+        logging.debug(f"Stored {len(rows)} tracks for genre {genre} in {self.table}")
+        return len(rows)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The job's modules import each other by name, as when running main.py from its own folder
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'WizeMusicFinder'))
@@ -0,0 +1,13 @@
+import os
+
+import benchmark
+
+
+def test_benchmark_leaves_the_environment_alone(monkeypatch):
+    monkeypatch.delenv('FAKE_SPOTDL_DELAY', raising=False)
+    result = benchmark.run_benchmark(benchmark.synthetic_catalog(6, tracks_per_album=2), ['pop'], 'stages',
+                                     download_latency=0.001)
+
+    assert result['db_rows'] > 0
+    assert 'FAKE_SPOTDL_DELAY' not in os.environ
+    assert set(result['stages']) == set(benchmark.STAGES)
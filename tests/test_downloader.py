@@ -0,0 +1,84 @@
+import logging
+import os
+import sys
+import time
+
+from benchmark import FAKE_SPOTDL
+from downloader import DownloadEngine, index_track_files
+
+
+def make_engine(calls, **kwargs):
+    engine = DownloadEngine([sys.executable, FAKE_SPOTDL], **kwargs)
+    run_spotdl = engine.run_spotdl
+
+    def recording_run_spotdl(track_ids, folder_path):
+        calls.append(list(track_ids))
+        return run_spotdl(track_ids, folder_path)
+
+    engine.run_spotdl = recording_run_spotdl
+    return engine
+
+
+def test_failed_tracks_are_retried_one_by_one(tmp_path, monkeypatch):
+    monkeypatch.setenv('FAKE_SPOTDL_FAIL', 'bad1')
+    calls = []
+    engine = make_engine(calls, batch_size=10, max_retries=2)
+
+    results = engine.download(['ok1', 'bad1', 'ok2', 'ok1'], str(tmp_path))
+
+    assert calls == [['ok1', 'bad1', 'ok2'], ['bad1'], ['bad1']]
+    assert [(result['track_id'], result['success'], result['attempts']) for result in results] == [
+        ('ok1', True, 1), ('bad1', False, 3), ('ok2', True, 1)]
+    files = index_track_files(str(tmp_path))
+    assert sorted(files) == ['ok1', 'ok2']
+    assert all(path.endswith('.mp3') for path in files.values())
+
+
+def test_retry_recovers_a_track_that_failed_in_its_batch(tmp_path, monkeypatch):
+    monkeypatch.setenv('FAKE_SPOTDL_FAIL', 'flaky')
+    calls = []
+    engine = make_engine(calls, batch_size=10, max_retries=2)
+    run_spotdl = engine.run_spotdl
+
+    def fail_once(track_ids, folder_path):
+        succeeded = run_spotdl(track_ids, folder_path)
+        monkeypatch.delenv('FAKE_SPOTDL_FAIL', raising=False)
+        return succeeded
+
+    engine.run_spotdl = fail_once
+    results = engine.download(['ok1', 'flaky'], str(tmp_path))
+
+    assert calls == [['ok1', 'flaky'], ['flaky']]
+    assert [(result['success'], result['attempts']) for result in results] == [(True, 1), (True, 2)]
+    assert os.path.exists(index_track_files(str(tmp_path))['flaky'])
+
+
+def test_spotdl_stderr_is_logged(tmp_path, monkeypatch, caplog):
+    monkeypatch.setenv('FAKE_SPOTDL_FAIL', 'bad1')
+    engine = DownloadEngine([sys.executable, FAKE_SPOTDL], max_retries=0)
+
+    with caplog.at_level(logging.ERROR):
+        engine.download(['bad1'], str(tmp_path))
+
+    assert "Failed to download spotify:track:bad1" in caplog.text
+
+
+def test_hung_spotdl_is_killed_after_its_timeout(tmp_path, monkeypatch):
+    monkeypatch.setenv('FAKE_SPOTDL_DELAY', '30')
+    engine = DownloadEngine([sys.executable, FAKE_SPOTDL], max_retries=0, timeout_per_track=0.5)
+
+    start = time.perf_counter()
+    results = engine.download(['slow1', 'slow2'], str(tmp_path))
+
+    assert time.perf_counter() - start < 10
+    assert [result['success'] for result in results] == [False, False]
+
+
+def test_engine_env_only_reaches_spotdl(tmp_path, monkeypatch):
+    monkeypatch.delenv('FAKE_SPOTDL_FAIL', raising=False)
+    engine = DownloadEngine([sys.executable, FAKE_SPOTDL], max_retries=0, env={'FAKE_SPOTDL_FAIL': 'bad1'})
+
+    results = engine.download(['ok1', 'bad1'], str(tmp_path))
+
+    assert [result['success'] for result in results] == [True, False]
+    assert 'FAKE_SPOTDL_FAIL' not in os.environ
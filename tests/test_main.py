@@ -0,0 +1,196 @@
+import math
+import os
+import sys
+import threading
+from datetime import datetime
+
+import pytest
+
+import main
+from benchmark import FAKE_SPOTDL, FakeSpotify, synthetic_catalog
+from downloader import DownloadEngine, index_track_files
+from storage import SQLiteStorage
+
+
+def test_resolved_release_date_is_a_full_iso_date():
+    catalog = synthetic_catalog(3, tracks_per_album=2)
+    album = catalog['albums'][0]
+    album['release_date'] = datetime.now().strftime('%Y-%m')
+    album['release_date_precision'] = 'month'
+
+    resolved = [song_info for _, song_info in main.iter_resolved_tracks(FakeSpotify(catalog), ['pop', 'rock', 'jazz'])]
+
+    from_album = [song_info for song_info in resolved if song_info['album'] == album['name']]
+    assert from_album
+    for song_info in from_album:
+        assert song_info['release_date'] == datetime.now().strftime('%Y-%m-01')
+        assert song_info['release_date_precision'] == 'month'
+    assert all(len(song_info['release_date']) == 10 for song_info in resolved)
+
+
+def test_week_key_defaults_to_current_iso_year():
+    iso_year = datetime.now().isocalendar()[0]
+    assert main.make_week_key(7) == f"{iso_year}-W07"
+    assert main.make_week_key(52, 2025) == "2025-W52"
+
+
+def test_get_top_tracks_batches_metadata_requests():
+    catalog = synthetic_catalog(40, tracks_per_album=10, max_age_days=60)
+    sp = FakeSpotify(catalog)
+
+    top_tracks = main.get_top_tracks(sp, 'pop')
+
+    artist_ids = {album['artists'][0]['id'] for album in catalog['albums']}
+    pop_albums = [album for album in catalog['albums']
+                  if 'pop' in catalog['artists'][album['artists'][0]['id']]['genres']]
+    track_count = sum(len(catalog['album_tracks'][album['id']]) for album in pop_albums)
+    assert len(top_tracks) == track_count
+    assert sp.calls == {
+        'new_releases': 1,
+        'artists': math.ceil(len(artist_ids) / 50),
+        'albums': math.ceil(len(pop_albums) / 20),
+        'tracks': math.ceil(track_count / 50),
+    }
+    assert sp.calls['artist'] == 0 and sp.calls['track'] == 0
+
+
+def test_genres_share_one_pass_over_new_releases():
+    # Every artist is pop, so a pop-only run and a three-genre run resolve the same albums
+    catalog = synthetic_catalog(30, tracks_per_album=3, genres=('pop',), max_age_days=60)
+    for n, artist in enumerate(catalog['artists'].values()):
+        artist['genres'] = ['pop', 'rock'] if n % 2 else ['pop', 'jazz']
+    single = FakeSpotify(catalog)
+    main.get_top_tracks_by_genre(single, ['pop'])
+    multi = FakeSpotify(catalog)
+    top_tracks = main.get_top_tracks_by_genre(multi, ['pop', 'rock', 'jazz'])
+
+    assert multi.calls == single.calls
+    rock_album = next(album for album in catalog['albums']
+                      if 'rock' in catalog['artists'][album['artists'][0]['id']]['genres'])
+    rock_track_ids = {track['id'] for track in catalog['album_tracks'][rock_album['id']]}
+    for genre in ('pop', 'rock'):
+        assert rock_track_ids <= {track['track_id'] for track in top_tracks[genre]}
+    assert not rock_track_ids & {track['track_id'] for track in top_tracks['jazz']}
+
+
+def test_rerun_only_redoes_missing_work(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    catalog = synthetic_catalog(12, tracks_per_album=3, max_age_days=60)
+    spotdl_calls = []
+    stored_rows = []
+
+    def run_job():
+        engine = DownloadEngine([sys.executable, FAKE_SPOTDL], max_workers=1)
+        run_spotdl = engine.run_spotdl
+
+        def recording_run_spotdl(track_ids, folder_path):
+            spotdl_calls.append(list(track_ids))
+            return run_spotdl(track_ids, folder_path)
+
+        engine.run_spotdl = recording_run_spotdl
+        storage = SQLiteStorage(str(tmp_path / 'weekly_playlist.db'))
+        write_tracks = storage.write_tracks
+
+        def recording_write_tracks(tracks, week_number, genre):
+            stored_rows.extend(tracks)
+            return write_tracks(tracks, week_number, genre)
+
+        storage.write_tracks = recording_write_tracks
+        return main.download_weekly_genre_playlist(['pop', 'rock'], cache_location='cache.db',
+                                                   manifest_path='manifest.db', storage=storage,
+                                                   sp=FakeSpotify(catalog), engine=engine)
+
+    first = run_job()
+    assert spotdl_calls and len(stored_rows) == sum(len(tracks) for tracks in first.values())
+
+    spotdl_calls.clear()
+    stored_rows.clear()
+    run_job()
+    assert spotdl_calls == []
+    assert stored_rows == []
+
+    # A truncated file is deleted and downloaded again, and nothing else is
+    truncated = first['pop'][0]
+    folder = main.playlist_folder('pop', datetime.now().isocalendar()[1])
+    path = index_track_files(folder)[truncated['track_id']]
+    with open(path, 'r+b') as audio_file:
+        audio_file.truncate(100)
+    run_job()
+    assert spotdl_calls == [[truncated['track_id']]]
+    assert stored_rows == []
+    assert os.path.getsize(index_track_files(folder)[truncated['track_id']]) > 100
+
+
+def test_failing_storage_setup_opens_nothing_else(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    def unmigrated_storage(*args):
+        raise RuntimeError("apply the migration first")
+
+    monkeypatch.setattr(main, 'load_credentials_postgres', lambda: ())
+    monkeypatch.setattr(main, 'PostgresStorage', unmigrated_storage)
+    threads_before = threading.active_count()
+
+    with pytest.raises(RuntimeError, match="migration"):
+        main.download_weekly_genre_playlist(['pop'], cache_location='cache.db', manifest_path='manifest.db',
+                                            sp=FakeSpotify(synthetic_catalog(3)))
+    assert threading.active_count() == threads_before
+    assert not os.path.exists('cache.db') and not os.path.exists('manifest.db')
+
+
+def test_failing_setup_closes_what_was_already_opened(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    def missing_credentials():
+        raise FileNotFoundError('credentials.json')
+
+    monkeypatch.setattr(main, 'authenticate_spotify', missing_credentials)
+    storage = SQLiteStorage(str(tmp_path / 'weekly_playlist.db'))
+    closed = []
+    storage.close = lambda: closed.append('storage')
+
+    with pytest.raises(FileNotFoundError):
+        main.download_weekly_genre_playlist(['pop'], storage=storage)
+    assert closed == ['storage']
+
+
+def test_weekly_run_returns_tracks_by_popularity(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    engine = DownloadEngine([sys.executable, FAKE_SPOTDL], max_workers=1)
+    storage = SQLiteStorage(str(tmp_path / 'weekly_playlist.db'))
+
+    top_tracks = main.download_weekly_genre_playlist(['pop', 'rock'], cache_location='cache.db',
+                                                     manifest_path='manifest.db', storage=storage,
+                                                     sp=FakeSpotify(synthetic_catalog(12, max_age_days=60)),
+                                                     engine=engine)
+
+    for genre, tracks in top_tracks.items():
+        assert tracks
+        assert [track['popularity'] for track in tracks] == sorted((track['popularity'] for track in tracks),
+                                                                   reverse=True)
+        assert all('position' not in track for track in tracks)
+        folder = main.playlist_folder(genre, datetime.now().isocalendar()[1])
+        playlist = os.path.join(folder, f"{folder}.m3u")
+        with open(playlist, encoding='utf-8') as playlist_file:
+            numbered = [line.split(',', 1)[1] for line in playlist_file if line.startswith('#EXTINF')]
+        assert numbered == [f"{position}. {track['artists']} - {track['name']}\n"
+                            for position, track in enumerate(tracks, start=1)]
+
+
+def test_main_authenticates_once(monkeypatch):
+    sp = object()
+    calls = []
+
+    def authenticate_spotify():
+        calls.append('auth')
+        return sp
+
+    def download_weekly_genre_playlist(genres, **kwargs):
+        calls.append(kwargs['sp'])
+
+    monkeypatch.setattr(main, 'authenticate_spotify', authenticate_spotify)
+    monkeypatch.setattr(main, 'download_weekly_genre_playlist', download_weekly_genre_playlist)
+
+    main.main()
+
+    assert calls == ['auth', sp]
@@ -0,0 +1,157 @@
+import time
+
+from metadata_cache import MetadataCache, RedisCacheBackend, SQLiteCacheBackend, cached_fetch
+
+
+def make_cache(tmp_path, max_entries=100, ttls=None):
+    return MetadataCache(SQLiteCacheBackend(str(tmp_path / 'metadata_cache.db'), max_entries=max_entries), ttls)
+
+
+def test_entries_expire_after_their_ttl(tmp_path):
+    cache = make_cache(tmp_path, ttls={'track': 0.2})
+    cache.set_many('track', {'t1': {'id': 't1'}})
+    cache.set_many('artist', {'a1': {'id': 'a1'}})
+    assert cache.get_many('track', ['t1']) == {'t1': {'id': 't1'}}
+
+    time.sleep(0.3)
+    assert cache.get_many('track', ['t1']) == {}
+    assert cache.get_many('artist', ['a1']) == {'a1': {'id': 'a1'}}
+    assert cache.stats()['track'] == {'hits': 1, 'misses': 1}
+    cache.close()
+
+
+def test_least_recently_read_entry_is_evicted(tmp_path):
+    cache = make_cache(tmp_path, max_entries=3)
+    for key in ('a', 'b', 'c'):
+        cache.set_many('artist', {key: key})
+        time.sleep(0.01)
+    cache.get_many('artist', ['a'])
+    time.sleep(0.01)
+    cache.set_many('artist', {'d': 'd'})
+
+    assert cache.get_many('artist', ['a', 'b', 'c', 'd']) == {'a': 'a', 'c': 'c', 'd': 'd'}
+    cache.close()
+
+
+def test_cached_fetch_only_fetches_misses(tmp_path):
+    cache = make_cache(tmp_path)
+    requested = []
+
+    def fetch_missing(keys):
+        requested.append(keys)
+        return {key: key.upper() for key in keys}
+
+    assert cached_fetch(cache, 'track', ['x', 'y'], fetch_missing) == {'x': 'X', 'y': 'Y'}
+    assert cached_fetch(cache, 'track', ['y', 'z', 'z'], fetch_missing) == {'y': 'Y', 'z': 'Z'}
+    assert requested == [['x', 'y'], ['z']]
+    cache.close()
+
+
+class FakeRedis:
+    """In-memory stand-in for the redis-py calls RedisCacheBackend makes, with millisecond expiry."""
+
+    def __init__(self):
+        self.values = {}
+        self.zsets = {}
+
+    def _alive(self, key):
+        value, expires_at = self.values.get(key, (None, None))
+        if expires_at is not None and expires_at <= time.time():
+            del self.values[key]
+            return None
+        return value
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+    def set(self, key, value, px=None):
+        self.values[key] = (value.encode(), time.time() + px / 1000 if px else None)
+
+    def mget(self, keys):
+        return [self._alive(key) for key in keys]
+
+    def delete(self, *keys):
+        for key in keys:
+            self.values.pop(key, None)
+
+    def zadd(self, name, mapping, xx=False):
+        zset = self.zsets.setdefault(name, {})
+        for member, score in mapping.items():
+            if not xx or member in zset:
+                zset[member] = score
+
+    def zrem(self, name, *members):
+        for member in members:
+            self.zsets.get(name, {}).pop(member, None)
+
+    def zcard(self, name):
+        return len(self.zsets.get(name, {}))
+
+    def zrangebyscore(self, name, low, high):
+        return [member for member, score in self.zsets.get(name, {}).items() if score <= high]
+
+    def zpopmin(self, name, count):
+        zset = self.zsets.get(name, {})
+        popped = sorted(zset.items(), key=lambda item: item[1])[:count]
+        for member, _ in popped:
+            del zset[member]
+        return popped
+
+    def close(self):
+        pass
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.commands.append((name, args, kwargs))
+
+    def execute(self):
+        return [getattr(self.client, name)(*args, **kwargs) for name, args, kwargs in self.commands]
+
+
+def make_redis_cache(monkeypatch, max_entries=100, ttls=None):
+    import redis
+
+    client = FakeRedis()
+    monkeypatch.setattr(redis.Redis, 'from_url', lambda url: client)
+    backend = RedisCacheBackend(max_entries=max_entries, prefix='test')
+    return MetadataCache(backend, ttls), client
+
+
+def test_redis_expired_keys_leave_both_sorted_sets(monkeypatch):
+    cache, client = make_redis_cache(monkeypatch, ttls={'track': 0.2})
+    cache.set_many('track', {'t1': 1, 't2': 2})
+    cache.set_many('artist', {'a1': 1})
+    time.sleep(0.3)
+
+    # A read that misses drops the key; a later write prunes expired keys nobody read
+    assert cache.get_many('track', ['t1']) == {}
+    assert 'test:track:t1' not in client.zsets['test:lru']
+    assert 'test:track:t1' not in client.zsets['test:expiry']
+    cache.set_many('artist', {'a2': 2})
+    assert set(client.zsets['test:lru']) == set(client.zsets['test:expiry']) == {'test:artist:a1', 'test:artist:a2'}
+
+
+def test_redis_eviction_only_removes_least_recently_read_live_keys(monkeypatch):
+    cache, client = make_redis_cache(monkeypatch, max_entries=3, ttls={'track': 0.2})
+    for entity, key in (('artist', 'a'), ('artist', 'b'), ('track', 'x')):
+        cache.set_many(entity, {key: key})
+        time.sleep(0.01)
+    cache.get_many('artist', ['b'])
+    time.sleep(0.3)
+
+    # x has expired, so a, b and c fit without evicting anything
+    cache.set_many('artist', {'c': 'c'})
+    assert cache.get_many('artist', ['a', 'b', 'c']) == {'a': 'a', 'b': 'b', 'c': 'c'}
+    assert client.zcard('test:lru') == 3
+
+    time.sleep(0.01)
+    cache.get_many('artist', ['b', 'c'])
+    cache.set_many('artist', {'d': 'd'})
+    assert cache.get_many('artist', ['a', 'b', 'c', 'd']) == {'b': 'b', 'c': 'c', 'd': 'd'}
+    assert set(client.zsets['test:lru']) == set(client.zsets['test:expiry']) == {
+        'test:artist:b', 'test:artist:c', 'test:artist:d'}
@@ -0,0 +1,131 @@
+import itertools
+import threading
+import time
+
+import pytest
+
+from pipeline import Pipeline
+
+
+def test_all_items_drain_through_several_workers():
+    collected = []
+    lock = threading.Lock()
+
+    def collect(batch):
+        with lock:
+            collected.extend(batch)
+
+    pipeline = Pipeline(queue_size=5)
+    pipeline.add_stage('double', lambda batch: [item * 2 for item in batch], workers=3, batch_size=7,
+                       batch_timeout=0.01)
+    pipeline.add_stage('collect', collect, workers=2)
+    metrics = pipeline.run(range(200))
+
+    assert sorted(collected) == [item * 2 for item in range(200)]
+    assert metrics['source']['emitted'] == 200
+    assert metrics['double']['received'] == metrics['double']['emitted'] == 200
+    assert metrics['collect']['received'] == 200
+
+
+def test_stage_error_is_raised_from_run():
+    def fail_on_five(batch):
+        if 5 in batch:
+            raise ValueError("bad item")
+        return batch
+
+    pipeline = Pipeline(queue_size=2)
+    pipeline.add_stage('check', fail_on_five, workers=2)
+    pipeline.add_stage('sink', lambda batch: None)
+
+    with pytest.raises(ValueError, match="bad item"):
+        pipeline.run(itertools.count())
+
+
+def test_cancel_unblocks_a_source_waiting_on_a_full_queue():
+    gate = threading.Event()
+
+    def stuck(batch):
+        gate.wait()
+
+    pipeline = Pipeline(queue_size=2)
+    pipeline.add_stage('stuck', stuck)
+    runner = threading.Thread(target=pipeline.run, args=(itertools.count(),), daemon=True)
+    runner.start()
+
+    # The stage holds one item and the queue two more, so the endless source blocks on its next put
+    deadline = time.perf_counter() + 2
+    while pipeline.source_metrics.emitted < 4 and time.perf_counter() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.2)
+    assert pipeline.source_metrics.emitted == 4
+
+    pipeline.cancel()
+    gate.set()
+    runner.join(2)
+    assert not runner.is_alive()
+
+
+def test_full_queue_holds_back_the_source():
+    queue_size = 3
+    produced = 0
+    lead = []
+
+    def source():
+        nonlocal produced
+        for item in range(50):
+            produced += 1
+            yield item
+
+    def slow(batch):
+        lead.append(produced - batch[0])
+        time.sleep(0.005)
+
+    pipeline = Pipeline(queue_size=queue_size)
+    pipeline.add_stage('slow', slow)
+    metrics = pipeline.run(source())
+
+    # The source can only be ahead by what the queue holds, plus the item it is trying to put
+    assert max(lead) <= queue_size + 2
+    assert metrics['slow']['max_queue_depth'] <= queue_size
+    assert metrics['slow']['received'] == 50
+
+
+def test_flush_forwards_held_back_items_before_the_stage_ends():
+    held = []
+    collected = []
+
+    def pairs(batch):
+        held.extend(batch)
+        outputs = []
+        while len(held) >= 2:
+            outputs.append(tuple(held[:2]))
+            del held[:2]
+        return outputs
+
+    pipeline = Pipeline(queue_size=4)
+    pipeline.add_stage('pairs', pairs, batch_size=3, flush=lambda: [tuple(held)] if held else [])
+    pipeline.add_stage('collect', collected.extend)
+    metrics = pipeline.run(range(5))
+
+    assert collected == [(0, 1), (2, 3), (4,)]
+    assert metrics['pairs']['emitted'] == 3
+
+
+def test_metrics_separate_wall_and_busy_time():
+    def source():
+        for item in range(8):
+            time.sleep(0.01)
+            yield item
+
+    def sleep(batch):
+        time.sleep(0.05)
+
+    pipeline = Pipeline(queue_size=8, source_name='produce')
+    pipeline.add_stage('sleep', sleep, workers=4)
+    metrics = pipeline.run(source())
+
+    assert metrics['produce']['emitted'] == 8
+    assert metrics['produce']['busy_seconds'] >= 0.08
+    # Four workers sleeping 0.05s on eight items: 0.4s busy in about 0.1s of wall time
+    assert metrics['sleep']['busy_seconds'] >= 0.4
+    assert metrics['sleep']['wall_seconds'] < metrics['sleep']['busy_seconds']
@@ -0,0 +1,33 @@
+import pytest
+
+from run_manifest import RunManifest
+
+
+def test_mark_unmark_and_completed(tmp_path):
+    manifest = RunManifest(str(tmp_path / 'run_manifest.db'))
+    manifest.mark('resolved', '2026-W42', 'pop', ['a', 'b', 'c'])
+    manifest.mark('downloaded', '2026-W42', 'pop', ['a', 'b'], {'a': 'a.mp3', 'b': 'b.mp3'})
+    manifest.mark('resolved', '2026-W43', 'pop', ['d'])
+
+    assert manifest.completed('resolved', '2026-W42', 'pop') == {'a', 'b', 'c'}
+    assert manifest.completed('downloaded', '2026-W42', 'pop') == {'a', 'b'}
+    assert manifest.completed('stored', '2026-W42', 'pop') == set()
+    assert manifest.completed('resolved', '2026-W42', 'rock') == set()
+
+    manifest.unmark('downloaded', '2026-W42', 'pop', ['b'])
+    assert manifest.completed('downloaded', '2026-W42', 'pop') == {'a'}
+    assert manifest.completed('resolved', '2026-W42', 'pop') == {'a', 'b', 'c'}
+    manifest.close()
+
+
+def test_completed_survives_reopening(tmp_path):
+    path = str(tmp_path / 'run_manifest.db')
+    manifest = RunManifest(path)
+    manifest.mark('stored', '2026-W42', 'jazz', ['a'])
+    manifest.close()
+
+    manifest = RunManifest(path)
+    assert manifest.completed('stored', '2026-W42', 'jazz') == {'a'}
+    with pytest.raises(ValueError):
+        manifest.mark('played', '2026-W42', 'jazz', ['a'])
+    manifest.close()
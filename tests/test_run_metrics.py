@@ -0,0 +1,26 @@
+from run_metrics import RunMetrics
+
+
+def test_pipeline_metrics_are_kept_and_emitted():
+    metrics = RunMetrics()
+    events = []
+    metrics.add_hook(events.append)
+    stages = {'download_top_tracks': {'wall_seconds': 2.0, 'busy_seconds': 7.5, 'emitted': 10}}
+
+    metrics.record_pipeline(stages, week='2026-W42')
+
+    assert metrics.snapshot()['pipeline'] == stages
+    assert events[0]['type'] == 'pipeline'
+    assert events[0]['stages'] == stages and events[0]['week'] == '2026-W42'
+    metrics.reset()
+    assert metrics.snapshot()['pipeline'] == {}
+
+
+def test_timed_totals_add_up_across_calls():
+    metrics = RunMetrics()
+    for _ in range(3):
+        with metrics.timed('insert'):
+            pass
+    timing = metrics.snapshot()['timings']['insert']
+    assert timing['count'] == 3
+    assert timing['total'] >= timing['max']
@@ -0,0 +1,112 @@
+import json
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+from spotipy.exceptions import SpotifyException
+
+import main
+from benchmark import FakeSpotify, synthetic_catalog
+from spotify_scheduler import SpotifyScheduler, TokenBucket, build_spotify_client, parse_retry_after
+
+
+class RateLimitedHandler(BaseHTTPRequestHandler):
+    # Answers the first request with 429 and Retry-After: 7, every later one with an artist
+    responses = []
+
+    def do_GET(self):
+        status, headers, body = self.responses.pop(0)
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps(body).encode())
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def rate_limited_server():
+    RateLimitedHandler.responses = [
+        (429, {'Retry-After': '7'}, {'error': {'status': 429, 'message': 'API rate limit exceeded'}}),
+        (200, {}, {'id': 'artist1', 'genres': ['pop']}),
+    ]
+    server = HTTPServer(('127.0.0.1', 0), RateLimitedHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/v1/"
+    server.shutdown()
+    server.server_close()
+
+
+def test_retry_after_pauses_shared_bucket(rate_limited_server):
+    sp = build_spotify_client(auth='token')
+    sp.prefix = rate_limited_server
+    pauses = []
+    with SpotifyScheduler(sp) as scheduler:
+        scheduler.bucket.pause = pauses.append
+        artist = scheduler.artist('artist1')
+
+    assert artist['id'] == 'artist1'
+    assert pauses == [7.0]
+    assert scheduler.stats()['artist']['retries'] == 1
+
+
+def test_token_bucket_pause_blocks_until_retry_after():
+    bucket = TokenBucket(rate=100, capacity=10)
+    bucket.pause(7)
+    assert 6.9 < bucket.paused_until - time.monotonic() <= 7
+    assert bucket.tokens == 0
+
+
+def test_raw_client_does_not_leak_scheduler_threads():
+    sp = FakeSpotify(synthetic_catalog(20))
+    main.get_top_tracks(sp, 'pop')
+    threads_before = threading.active_count()
+    for _ in range(5):
+        main.get_top_tracks(sp, 'pop')
+        main.fetch_artist_details(sp, 'artist000000')
+    assert threading.active_count() == threads_before
+
+
+def test_retry_after_accepts_seconds_and_http_dates():
+    assert parse_retry_after('7') == 7.0
+    retry_at = datetime.now(timezone.utc) + timedelta(seconds=30)
+    assert 28 < parse_retry_after(format_datetime(retry_at, usegmt=True)) <= 30
+    assert parse_retry_after('soon') is None
+    assert parse_retry_after(None) is None
+
+
+class RateLimitedSpotify:
+    def __init__(self, retry_after):
+        self.retry_after = retry_after
+        self.calls = 0
+
+    def artist(self, artist_id):
+        self.calls += 1
+        raise SpotifyException(429, -1, "API rate limit exceeded", headers={'Retry-After': self.retry_after})
+
+
+def test_retry_after_above_limit_fails_instead_of_pausing():
+    sp = RateLimitedSpotify('3600')
+    pauses = []
+    with SpotifyScheduler(sp, max_retry_after=60) as scheduler:
+        scheduler.bucket.pause = pauses.append
+        with pytest.raises(SpotifyException):
+            scheduler.artist('artist1')
+
+    assert sp.calls == 1
+    assert pauses == []
+    assert scheduler.stats()['artist']['errors'] == 1
+
+
+def test_unparseable_retry_after_falls_back_to_backoff():
+    scheduler = SpotifyScheduler(RateLimitedSpotify('soon'), max_backoff=2.0)
+    error = SpotifyException(429, -1, "API rate limit exceeded", headers={'Retry-After': 'soon'})
+    assert 0 < scheduler._backoff(3, error) <= 2.0
+    scheduler.close()
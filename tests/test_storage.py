@@ -0,0 +1,94 @@
+import sqlite3
+from unittest import mock
+
+import psycopg2.extras
+import psycopg2.pool
+import pytest
+from psycopg2 import sql
+
+from storage import PostgresStorage, SQLiteStorage, track_rows
+
+
+def make_tracks(popularity):
+    return [{'track_id': f"t{n}", 'name': f"Track {n}", 'album': "Album", 'release_date': '2026-10-01',
+             'duration_ms': 180000, 'popularity': popularity, 'artists': "Artist"} for n in range(3)]
+
+
+def test_rerun_upserts_instead_of_duplicating(tmp_path):
+    path = tmp_path / 'weekly_playlist.db'
+    storage = SQLiteStorage(str(path))
+    assert storage.write_tracks(make_tracks(10), 42, 'pop') == 3
+    assert storage.write_tracks(make_tracks(55), 42, 'pop') == 3
+    storage.write_tracks(make_tracks(10)[:1], 42, 'rock')
+    storage.close()
+
+    conn = sqlite3.connect(path)
+    rows = conn.execute("SELECT genre, popularity FROM weekly_playlist ORDER BY genre, track_id").fetchall()
+    conn.close()
+    assert rows == [('pop', 55)] * 3 + [('rock', 10)]
+
+
+def test_duplicate_tracks_become_one_row():
+    tracks = make_tracks(10) + [dict(make_tracks(10)[0], popularity=99)]
+    rows = track_rows(tracks, 42, 'pop')
+    assert [(row[0], row[5]) for row in rows] == [('t0', 99), ('t1', 10), ('t2', 10)]
+
+
+def render(query):
+    # Renders a psycopg2.sql composition without a server, quoting identifiers the way Postgres does
+    if isinstance(query, sql.Composed):
+        return ''.join(render(part) for part in query.seq)
+    if isinstance(query, sql.Identifier):
+        return '.'.join(f'"{name}"' for name in query.strings)
+    return query.string
+
+
+@pytest.fixture
+def postgres(monkeypatch):
+    pool = mock.MagicMock()
+    cursor = pool.getconn.return_value.cursor.return_value.__enter__.return_value
+    cursor.fetchone.return_value = (True, True)
+    monkeypatch.setattr(psycopg2.pool, 'ThreadedConnectionPool', lambda *args, **kwargs: pool)
+    return pool, cursor
+
+
+def test_postgres_upsert_quotes_table_and_columns(postgres, monkeypatch):
+    pool, cursor = postgres
+    executed = []
+
+    def execute_values(cur, query, rows, page_size):
+        executed.append((query, rows))
+
+    monkeypatch.setattr(psycopg2.extras, 'execute_values', execute_values)
+    storage = PostgresStorage('localhost', 5432, 'db', 'user', 'password')
+
+    assert storage.write_tracks(make_tracks(10) * 2, 42, 'pop') == 3
+
+    query, rows = executed[0]
+    assert render(query) == (
+        'INSERT INTO "wizeplaylist"."weekly_playlist" ("track_id", "name", "album", "release_date", '
+        '"duration_ms", "popularity", "artist", "week_nb", "genre") VALUES %s '
+        'ON CONFLICT ("track_id", "week_nb", "genre") DO UPDATE SET "name" = EXCLUDED."name", '
+        '"album" = EXCLUDED."album", "release_date" = EXCLUDED."release_date", '
+        '"duration_ms" = EXCLUDED."duration_ms", "popularity" = EXCLUDED."popularity", '
+        '"artist" = EXCLUDED."artist"')
+    assert len(rows) == 3
+    assert pool.putconn.call_count == pool.getconn.call_count
+
+
+def test_postgres_checks_schema_without_changing_it(postgres):
+    pool, cursor = postgres
+    PostgresStorage('localhost', 5432, 'db', 'user', 'password')
+
+    statement, parameters = cursor.execute.call_args.args
+    assert statement.lstrip().upper().startswith('SELECT')
+    assert parameters == {'table': 'wizeplaylist.weekly_playlist', 'key': ['genre', 'track_id', 'week_nb']}
+
+
+def test_postgres_refuses_an_unmigrated_table(postgres):
+    pool, cursor = postgres
+    cursor.fetchone.return_value = (True, False)
+
+    with pytest.raises(RuntimeError, match='001_weekly_playlist_track_id.sql'):
+        PostgresStorage('localhost', 5432, 'db', 'user', 'password')
+    pool.closeall.assert_called_once()